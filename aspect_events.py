@@ -0,0 +1,155 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+aspect_events.py
+
+Finds when each planet pair enters, exactly hits and leaves the aspect bands scored by
+predict_interference, using Skyfield's find_discrete / find_minima instead of sampling.
+
+#Example command
+python aspect_events.py --start_year 1859 --end_year 1859 --csv_output events.csv
+'''
+
+import argparse
+import csv
+
+import numpy as np
+from skyfield.searchlib import find_discrete, find_minima, find_maxima
+
+from astro_utils import (BODY_NAMES, MAX_ANGULAR_RATES, calculate_angle, format_date, get_pair_names,
+                         get_planet_positions_batch, get_timescale, set_ephemeris)
+from interference_predictor import ASPECT_BANDS, get_aspect_index
+from time_grid import astronomical_year, historical_year
+
+# Exact angle per band index; index -1 (no band) maps to the trailing 0
+ASPECT_TARGETS = np.array([target for _, target, *_ in ASPECT_BANDS] + [0])
+
+# Narrowest band or gap between bands, in degrees
+MIN_BAND_WIDTH = 10
+
+# Function to build the separation function of one pair for Skyfield's search routines.
+# step_days is a quarter of the time the pair needs to sweep MIN_BAND_WIDTH, so no band is skipped.
+def pair_separation(pair, kernel=None):
+    planet1, planet2 = pair.split('-')
+
+    def separation(t):
+        ra, dec, _ = get_planet_positions_batch(t, kernel, planets=(planet1, planet2))
+        return calculate_angle(ra[:, 0], dec[:, 0], ra[:, 1], dec[:, 1])
+
+    separation.step_days = MIN_BAND_WIDTH / (MAX_ANGULAR_RATES[planet1] + MAX_ANGULAR_RATES[planet2]) / 4
+    return separation
+
+# Function to find the aspect events of one pair between two Skyfield Times.
+# Returns a list of dicts with 'pair', 'aspect', 'start', 'exact' and 'end' as TT Julian dates;
+# 'start'/'end' are None for events already running at the range edges.
+def find_aspect_events(start_time, end_time, pair, kernel=None, span_days=36525):
+    ts = get_timescale()
+    separation = pair_separation(pair, kernel)
+
+    # State = 2 * band index + (separation >= exact angle), so crossings of the exact angle are found too
+    def aspect_state(t):
+        angles = separation(t)
+        aspect_index = get_aspect_index(angles)
+        return 2 * aspect_index + (angles >= ASPECT_TARGETS[aspect_index])
+    aspect_state.step_days = separation.step_days
+
+    # Search in spans so memory stays bounded on multi-millennium ranges
+    initial_state = int(aspect_state(ts.tt_jd(np.array([start_time.tt])))[0])
+    transitions, extrema = [], []
+    for span_start in np.arange(start_time.tt, end_time.tt, span_days):
+        span_end = min(span_start + span_days, end_time.tt)
+        t0, t1 = ts.tt_jd(span_start), ts.tt_jd(span_end)
+        times, states = find_discrete(t0, t1, aspect_state)
+        transitions.extend(zip(times.tt, states))
+        for finder in (find_minima, find_maxima):
+            times, angles = finder(t0, t1, separation)
+            extrema.extend(zip(times.tt, angles))
+
+    events = []
+    event_start, aspect_index, crossings = None, initial_state // 2, []
+    for jd, state in transitions + [(end_time.tt, None)]:
+        new_index = aspect_index if state is None else state // 2
+        if state is not None and new_index == aspect_index:
+            crossings.append(jd)  # Exact angle crossed inside the current band
+            continue
+        if aspect_index >= 0:
+            event_end = jd if state is not None else None
+            events.append({
+                'pair': pair,
+                'aspect': ASPECT_BANDS[aspect_index][0],
+                'start': event_start,
+                'exact': exact_time(aspect_index, crossings, extrema,
+                                    start_time.tt if event_start is None else event_start, jd),
+                'end': event_end,
+            })
+        event_start, aspect_index, crossings = jd, new_index, []
+    return events
+
+# Function to pick the exact instant of an event: a crossing of the exact angle if there is one,
+# otherwise the local extremum of the separation closest to it (conjunctions, oppositions, grazes)
+def exact_time(aspect_index, crossings, extrema, start_jd, end_jd):
+    if crossings:
+        return crossings[0]
+    target = ASPECT_TARGETS[aspect_index]
+    candidates = [(abs(angle - target), jd) for jd, angle in extrema if start_jd <= jd <= end_jd]
+    return min(candidates)[1] if candidates else None
+
+# Function to format a TT Julian date as local Date/Time strings
+def format_jd(jd, zone):
+    if jd is None:
+        return '', ''
+    year, month, day, hour, minute, second = get_timescale().tt_jd(jd + zone / 24).utc
+    return format_date(int(historical_year(year)), int(month), int(day)), f"{int(hour):02d}:{int(minute):02d}:{int(second):02d}"
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Find aspect events (start, exact, end) for each planet pair.")
+    parser.add_argument("--start_year", type=int, required=True, help="Start year (e.g., -1000 for 1000 BCE)")
+    parser.add_argument("--end_year", type=int, required=True, help="End year (e.g., 2023)")
+    parser.add_argument("--csv_output", required=True, help="CSV output file name")
+    parser.add_argument("--pairs", nargs="+", default=get_pair_names(BODY_NAMES), help="Planet pairs, e.g. mercury-venus (default: all)")
+    parser.add_argument("--zone", type=int, default=-5, help="Time zone offset from UTC of the reported local times (default: -5)")
+    parser.add_argument("--ephemeris", help="JPL kernel to load, e.g. de421.bsp (default: de406.bsp or $NERAAS_EPHEMERIS)")
+
+    args = parser.parse_args()
+    if 0 in (args.start_year, args.end_year):
+        parser.error("there is no year 0; use -1 for 1 BCE")
+
+    if args.ephemeris:
+        set_ephemeris(args.ephemeris)
+
+    ts = get_timescale()
+    start_time = ts.utc(int(astronomical_year(args.start_year)), 1, 1)
+    end_time = ts.utc(int(astronomical_year(args.end_year)) + 1, 1, 1)
+
+    events = []
+    for pair in args.pairs:
+        events.extend(find_aspect_events(start_time, end_time, pair))
+    events.sort(key=lambda event: (event['start'] is not None, event['start'] or 0, event['pair']))
+
+    with open(args.csv_output, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Pair', 'Aspect', 'Start_Date', 'Start_Time', 'Exact_Date', 'Exact_Time', 'End_Date', 'End_Time'])
+        for event in events:
+            writer.writerow([event['pair'], event['aspect']]
+                            + list(format_jd(event['start'], args.zone))
+                            + list(format_jd(event['exact'], args.zone))
+                            + list(format_jd(event['end'], args.zone)))
+    print(f"{len(events)} events saved to {args.csv_output}")
+
+if __name__ == "__main__":
+    main()
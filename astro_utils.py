@@ -17,62 +17,188 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 #astro_utils.py
 '''
-from skyfield.api import load
+from datetime import datetime
+import threading
+import os
 import numpy as np
 
-def get_planet_positions(date):
-    #planets = load('de421.bsp')  # Load planetary ephemeris small date range
-    planets = load('de406.bsp')  # Load planetary ephemeris large date range 3000 BCE - 3000 CE
-    ts = load.timescale()
-    t = ts.utc(date.year, date.month, date.day, date.hour, date.minute)
+from instrumentation import stage, timed
+
+# Default kernel; override with the NERAAS_EPHEMERIS environment variable or set_ephemeris()
+#DEFAULT_EPHEMERIS = 'de421.bsp'  # Planetary ephemeris small date range
+DEFAULT_EPHEMERIS = os.environ.get('NERAAS_EPHEMERIS', 'de406.bsp')  # Large date range 3000 BCE - 3000 CE
+
+# Correct names for planets in de406.bsp
+planet_identifiers = {
+    'mercury': 'mercury',
+    'venus': 'venus',
+    'earth': 'earth',
+    'mars': 'mars',
+    'jupiter': 'jupiter barycenter',
+    'saturn': 'saturn barycenter'
+}
+
+# Column order of the batch arrays; the Sun sits at the origin of the heliocentric model
+BODY_NAMES = ('sun',) + tuple(planet_identifiers)
+
+# Upper bounds on each body's angular rate in degrees/day (perihelion motion plus a margin; the Sun is fixed).
+# Two bodies' separation cannot change faster than the sum of their rates.
+MAX_ANGULAR_RATES = {
+    'sun': 0.0,
+    'mercury': 6.5,
+    'venus': 1.7,
+    'earth': 1.05,
+    'mars': 0.7,
+    'jupiter': 0.1,
+    'saturn': 0.04,
+}
+
+# Process-wide registry: one loaded kernel (with its resolved body handles) per file, one timescale
+_registry_lock = threading.Lock()
+_ephemerides = {}
+_timescale = None
+
+# Function to choose the kernel used when no explicit one is passed
+def set_ephemeris(kernel):
+    global DEFAULT_EPHEMERIS
+    DEFAULT_EPHEMERIS = kernel
+
+# Function to open a kernel once per process.
+# Skyfield/jplephem memory-map the SPK segments, so every thread shares the same mapping.
+# Returns (planets, bodies) where bodies maps our planet names to resolved Skyfield handles.
+def get_ephemeris(kernel=None):
+    kernel = kernel or DEFAULT_EPHEMERIS
+    entry = _ephemerides.get(kernel)
+    if entry is None:
+        with _registry_lock:
+            entry = _ephemerides.get(kernel)
+            if entry is None:
+                from skyfield.api import load  # Imported on first use to keep CLI start-up fast
+                with stage('kernel_load'):
+                    planets = load(kernel)
+                bodies = {'sun': planets['sun']}
+                bodies.update({name: planets[identifier] for name, identifier in planet_identifiers.items()})
+                entry = _ephemerides[kernel] = (planets, bodies)
+    return entry
+
+# Function to load the timescale (leap-second and Delta T tables) once per process
+def get_timescale():
+    global _timescale
+    if _timescale is None:
+        with _registry_lock:
+            if _timescale is None:
+                from skyfield.api import load
+                with stage('timescale_load'):
+                    _timescale = load.timescale()
+    return _timescale
+
+# Function to parse a CE date ("YYYY-MM-DD") and time ("HH:MM") into a datetime.
+# datetime cannot hold BCE years, so BCE dates raise ValueError instead of silently becoming CE;
+# generate_data.py and the other time_grid (Julian Day Number) based tools handle them.
+def parse_date(date_str, time_str):
+    if "BCE" in date_str or date_str.strip().startswith("-"):
+        raise ValueError(f"{date_str} is a BCE date, which a datetime cannot hold; use generate_data.py for BCE dates")
+    return datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
+
+# Function to format a date the way generate_dates does (negative years become BCE)
+def format_date(year, month, day):
+    if year < 0:
+        return f"{abs(year):04d}-{month:02d}-{day:02d} BCE"
+    return f"{year:04d}-{month:02d}-{day:02d}"
+
+# Function to build one vectorized Skyfield Time from a sequence of UTC datetimes (or pass a Time through)
+def make_time(ts, dates):
+    if hasattr(dates, 'tt'):
+        return dates  # Already a Skyfield Time
+    dates = list(dates)
+    return ts.utc(
+        np.array([d.year for d in dates]),
+        np.array([d.month for d in dates]),
+        np.array([d.day for d in dates]),
+        np.array([d.hour for d in dates]),
+        np.array([d.minute for d in dates]),
+        np.array([d.second for d in dates]),
+    )
+
+# Function to compute the astrometric position vector of the Sun seen from each planet.
+# Returns an array shaped (n_times, n_bodies, 3) in AU with bodies ordered as planets (BODY_NAMES by default).
+@timed('positions')
+def get_planet_vectors_batch(dates, kernel=None, planets=BODY_NAMES):
+    _, bodies = get_ephemeris(kernel)
+    t = make_time(get_timescale(), dates)
+
+    sun = bodies['sun']
+
+    n_times = len(t.tt) if np.ndim(t.tt) else 1
+    vectors = np.zeros((n_times, len(planets), 3))
+
+    for column, planet_name in enumerate(planets):
+        if planet_name == 'sun':
+            continue  # The Sun stays at the origin
+        planet = bodies[planet_name]
+        astrometric = planet.at(t).observe(sun)
+        vectors[:, column] = np.reshape(astrometric.position.au, (3, n_times)).T
+
+    return vectors
+
+# Function to convert (..., 3) position vectors to RA/Dec in degrees and distance in AU,
+# the same spherical conversion Skyfield's radec() applies to ICRF positions
+def vectors_to_radec(vectors):
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    ra = np.degrees(np.arctan2(y, x)) % 360
+    dec = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    distance = np.sqrt(x * x + y * y + z * z)  # Distance in Astronomical Units (AU)
+    return ra, dec, distance
 
-    sun = planets['sun']
+# Function to compute RA/Dec/distance for many UTC instants at once.
+# Returns three arrays shaped (n_times, n_bodies) with columns ordered as planets (BODY_NAMES by default).
+def get_planet_positions_batch(dates, kernel=None, planets=BODY_NAMES):
+    return vectors_to_radec(get_planet_vectors_batch(dates, kernel, planets))
 
-    # Correct names for planets in de406.bsp
-    planet_identifiers = {
-        'mercury': 'mercury',
-        'venus': 'venus',
-        'earth': 'earth',
-        'mars': 'mars',
-        'jupiter': 'jupiter barycenter',
-        'saturn': 'saturn barycenter'
-    }
+def get_planet_positions(date, kernel=None):
+    ra, dec, distance = get_planet_positions_batch([date], kernel)
 
     # Include the Sun at position (0, 0) in the heliocentric model
     planet_positions = {'sun': (0, 0, 0)}  # Sun at the origin
 
-    for planet_name, planet_identifier in planet_identifiers.items():
-        planet = planets[planet_identifier]
-        astrometric = planet.at(t).observe(sun)
-        ra, dec, distance = astrometric.radec()
-
-        # Convert RA from hours to degrees (since RA is usually expressed in hours)
-        ra_degrees = ra.hours * 15
-        planet_positions[planet_name] = (ra_degrees, dec.degrees, distance.au)  # Add distance in Astronomical Units (AU)
+    for column, planet_name in enumerate(BODY_NAMES[1:], start=1):
+        planet_positions[planet_name] = (ra[0, column], dec[0, column], distance[0, column])
 
     return planet_positions
 
-
-
-
-
+# Function to compute angular separation in degrees; broadcasts over NumPy arrays.
+# Uses the Vincenty atan2 form, which stays accurate near 0° and 180° and never yields NaN (arccos can).
 def calculate_angle(ra1, dec1, ra2, dec2):
     # Convert angles to radians
     ra1, dec1, ra2, dec2 = map(np.radians, [ra1, dec1, ra2, dec2])
 
     # Calculate the angular separation
     delta_ra = ra2 - ra1
-    angle = np.arccos(np.sin(dec1) * np.sin(dec2) + np.cos(dec1) * np.cos(dec2) * np.cos(delta_ra))
+    sin_dec1, cos_dec1 = np.sin(dec1), np.cos(dec1)
+    sin_dec2, cos_dec2 = np.sin(dec2), np.cos(dec2)
+    x = cos_dec2 * np.sin(delta_ra)
+    y = cos_dec1 * sin_dec2 - sin_dec1 * cos_dec2 * np.cos(delta_ra)
+    z = sin_dec1 * sin_dec2 + cos_dec1 * cos_dec2 * np.cos(delta_ra)
+    angle = np.arctan2(np.hypot(x, y), z)
     return np.degrees(angle)
 
+# Function to name the planet pairs in the column order of get_all_angles_batch
+def get_pair_names(planets=BODY_NAMES):
+    rows, columns = np.triu_indices(len(planets), k=1)
+    return [f'{planets[i]}-{planets[j]}' for i, j in zip(rows, columns)]
+
+# Function to compute every pairwise separation for many instants at once.
+# ra and dec are (n_times, n_bodies) arrays; returns the upper triangle of the
+# separation matrix as a (n_times, n_pairs) array with columns ordered as get_pair_names().
+@timed('angles')
+def get_all_angles_batch(ra, dec):
+    ra, dec = np.atleast_2d(ra), np.atleast_2d(dec)
+    rows, columns = np.triu_indices(ra.shape[1], k=1)
+    return calculate_angle(ra[:, rows], dec[:, rows], ra[:, columns], dec[:, columns])
+
 def get_all_angles(planet_positions):
-    angles = {}
     planets = list(planet_positions.keys())
-    for i in range(len(planets)):
-        for j in range(i+1, len(planets)):
-            angle = calculate_angle(
-                planet_positions[planets[i]][0], planet_positions[planets[i]][1],
-                planet_positions[planets[j]][0], planet_positions[planets[j]][1]
-            )
-            angles[f'{planets[i]}-{planets[j]}'] = angle
-    return angles
+    ra = np.array([[planet_positions[planet][0] for planet in planets]], dtype=float)
+    dec = np.array([[planet_positions[planet][1] for planet in planets]], dtype=float)
+    angles = get_all_angles_batch(ra, dec)[0]
+    return dict(zip(get_pair_names(planets), angles))
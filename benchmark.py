@@ -0,0 +1,229 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+benchmark.py
+
+Times every stage of the prediction pipeline and records throughput, latency percentiles and
+peak RSS to JSON, optionally comparing against a stored baseline. Runs offline against the
+small de421.bsp kernel (1900-2050), which must sit in the working directory; the harness stops
+rather than let Skyfield download a missing kernel. The in-process stages share one process-wide
+peak RSS; each generate_data.py case reports the peak of its own process.
+
+#Example commands
+python benchmark.py --output bench_results.json --save_baseline bench_baseline.json
+python benchmark.py --output bench_results.json --baseline bench_baseline.json
+'''
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import astro_utils
+from astro_utils import (BODY_NAMES, calculate_angle, get_all_angles, get_all_angles_batch, get_planet_positions,
+                         get_planet_positions_batch, set_ephemeris)
+from interference_predictor import predict_interference, predict_interference_batch
+
+# generate_data.py end-to-end cases: (interval, start_year, end_year)
+GENERATE_CASES = [
+    ("years", 1900, 2049),
+    ("seasons", 1950, 2049),
+    ("months", 1950, 2049),
+    ("days", 2000, 2009),
+    ("hours", 2000, 2000),
+]
+
+# Function to convert a ru_maxrss value to MB
+def maxrss_mb(maxrss):
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024  # bytes on macOS, KB on Linux
+
+# Function to run a command and return its own peak RSS in MB, read from its rusage when it is reaped.
+# (RUSAGE_CHILDREN only holds the largest peak of all children so far.)
+def run_measured(command):
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=stderr)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr.read())
+    return maxrss_mb(usage.ru_maxrss)
+
+# Function to time repeated calls of fn; items is the number of timestamps each call covers
+def time_stage(fn, repeat, items=1):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'calls': repeat,
+        'timestamps_per_sec': items * repeat / sum(latencies),
+        'latency_ms': {f'p{percentile}': float(np.percentile(latencies_ms, percentile)) for percentile in (50, 90, 99)},
+    }
+
+# Function to forget the cached kernel and timescale so the next call pays the cold-start cost
+def reset_ephemeris_cache():
+    astro_utils._ephemerides.clear()
+    astro_utils._timescale = None
+
+# Function to benchmark the in-process stages
+def run_library_stages(batch_size, repeat):
+    stages = {}
+    dates = [datetime(2000, 1, 1) + timedelta(hours=i) for i in range(batch_size)]
+
+    stages['get_planet_positions_cold'] = time_stage(
+        lambda: (reset_ephemeris_cache(), get_planet_positions(dates[0])), max(1, repeat // 10))
+    stages['get_planet_positions_warm'] = time_stage(lambda: get_planet_positions(dates[0]), repeat)
+    stages['get_planet_positions_batch'] = time_stage(lambda: get_planet_positions_batch(dates), repeat, batch_size)
+
+    ra, dec, distance = get_planet_positions_batch(dates)
+    positions = [{planet: (ra[row, column], dec[row, column], distance[row, column])
+                  for column, planet in enumerate(BODY_NAMES)} for row in range(batch_size)]
+    angles = [get_all_angles(planet_positions) for planet_positions in positions]
+    angles_batch = get_all_angles_batch(ra, dec)
+
+    stages['calculate_angle_scalar'] = time_stage(
+        lambda: [calculate_angle(ra[row, 1], dec[row, 1], ra[row, 2], dec[row, 2]) for row in range(batch_size)],
+        repeat, batch_size)
+    stages['calculate_angle_batch'] = time_stage(
+        lambda: calculate_angle(ra[:, 1], dec[:, 1], ra[:, 2], dec[:, 2]), repeat, batch_size)
+    stages['get_all_angles_scalar'] = time_stage(
+        lambda: [get_all_angles(planet_positions) for planet_positions in positions], repeat, batch_size)
+    stages['get_all_angles_batch'] = time_stage(lambda: get_all_angles_batch(ra, dec), repeat, batch_size)
+    stages['predict_interference_scalar'] = time_stage(
+        lambda: [predict_interference(pair_angles) for pair_angles in angles], repeat, batch_size)
+    stages['predict_interference_batch'] = time_stage(
+        lambda: predict_interference_batch(angles_batch), repeat, batch_size)
+
+    # Render on the headless backend; plt.show() is then a no-op
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from visualization import plot_planet_positions_polar
+    score, probability = predict_interference(angles[0])
+    ra_dec_info = {planet: (planet_ra, planet_dec) for planet, (planet_ra, planet_dec, _) in positions[0].items()}
+    stages['plot_planet_positions_polar'] = time_stage(
+        lambda: (plot_planet_positions_polar(positions[0], score, probability, ra_dec_info, '2000-01-01', '00:00'),
+                 plt.close('all')),
+        max(1, repeat // 10))
+    return stages
+
+# Function to benchmark generate_data.py end to end as a separate process
+def run_generate_stages(ephemeris):
+    stages = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for interval, start_year, end_year in GENERATE_CASES:
+            csv_output = os.path.join(tmpdir, f"{interval}.csv")
+            command = [sys.executable, "generate_data.py", "--start_year", str(start_year), "--end_year", str(end_year),
+                       "--interval", interval, "--csv_output", csv_output, "--ephemeris", ephemeris]
+            started = time.perf_counter()
+            peak_rss = run_measured(command)
+            elapsed = time.perf_counter() - started
+            with open(csv_output) as csvfile:
+                rows = sum(1 for _ in csvfile) - 1  # Minus the header
+            stages[f'generate_data_{interval}_{start_year}_{end_year}'] = {
+                'calls': 1,
+                'timestamps_per_sec': rows / elapsed,
+                'latency_ms': {'p50': elapsed * 1000, 'p90': elapsed * 1000, 'p99': elapsed * 1000},
+                'peak_rss_mb': peak_rss,
+            }
+    return stages
+
+# Function to compare results with a baseline; returns a list of regression messages
+def compare(results, baseline, tolerance):
+    regressions = []
+    for stage, measured in results['stages'].items():
+        reference = baseline['stages'].get(stage)
+        if reference is None:
+            continue
+        if measured['timestamps_per_sec'] < reference['timestamps_per_sec'] * (1 - tolerance):
+            regressions.append(f"{stage}: throughput {measured['timestamps_per_sec']:.1f}/s "
+                               f"vs baseline {reference['timestamps_per_sec']:.1f}/s")
+        if measured['latency_ms']['p99'] > reference['latency_ms']['p99'] * (1 + tolerance):
+            regressions.append(f"{stage}: p99 {measured['latency_ms']['p99']:.2f} ms "
+                               f"vs baseline {reference['latency_ms']['p99']:.2f} ms")
+        if 'peak_rss_mb' in measured and 'peak_rss_mb' in reference \
+                and measured['peak_rss_mb'] > reference['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{stage}: peak RSS {measured['peak_rss_mb']:.1f} MB "
+                               f"vs baseline {reference['peak_rss_mb']:.1f} MB")
+    return regressions
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the prediction pipeline.")
+    parser.add_argument("--ephemeris", default="de421.bsp", help="JPL kernel to benchmark against (default: de421.bsp)")
+    parser.add_argument("--batch_size", type=int, default=1000, help="Timestamps per batch call (default: 1000)")
+    parser.add_argument("--repeat", type=int, default=20, help="Calls per stage (default: 20)")
+    parser.add_argument("--skip_generate", action="store_true", help="Skip the generate_data.py end-to-end runs")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results (default: bench_results.json)")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save_baseline", help="Also write the results to this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before flagging a regression (default: 0.2)")
+
+    args = parser.parse_args()
+
+    # Skyfield would download a missing kernel; the benchmark must not depend on the network
+    if not os.path.exists(args.ephemeris):
+        sys.exit(f"Kernel {args.ephemeris} not found in {os.getcwd()}; copy it here (or pass --ephemeris PATH) "
+                 f"so the benchmark runs offline")
+    set_ephemeris(args.ephemeris)
+
+    stages = run_library_stages(args.batch_size, args.repeat)
+    if not args.skip_generate:
+        stages.update(run_generate_stages(args.ephemeris))
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'ephemeris': args.ephemeris,
+        'batch_size': args.batch_size,
+        'peak_rss_mb': maxrss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),  # Of the in-process stages
+        'stages': stages,
+    }
+
+    for stage, measured in stages.items():
+        rss = f"  rss {measured['peak_rss_mb']:7.1f} MB" if 'peak_rss_mb' in measured else ""
+        print(f"{stage:45s} {measured['timestamps_per_sec']:14.1f} ts/s  p50 {measured['latency_ms']['p50']:10.3f} ms  "
+              f"p99 {measured['latency_ms']['p99']:10.3f} ms{rss}")
+    print(f"Peak RSS of the in-process stages: {results['peak_rss_mb']:.1f} MB")
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
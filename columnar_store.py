@@ -0,0 +1,187 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+columnar_store.py
+
+Compact columnar output: a directory holding one raw little-endian array file per column
+(float64 local Julian date, int16 score, float32 probability, RA and Dec) and a meta.json
+with the dtypes and row count. Chunks are appended column by column and the row count is
+committed last, so a crash never exposes a partial chunk. Readers memory-map the files and
+get NumPy views without parsing or copying. Derived columns (e.g. scores written by rescore.py)
+are listed under 'derived' with the row count they were computed for; once rows are appended
+they no longer line up and are left out until recomputed.
+
+#Example commands
+python generate_data.py --start_year 1850 --end_year 1869 --interval hours --columnar_output results.cols
+python columnar_store.py results.cols --head 5
+'''
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from astro_utils import BODY_NAMES
+from result_store import jd_to_minutes
+from time_grid import grid_labels
+
+FORMAT_VERSION = 1
+
+COLUMN_DTYPES = {'jd': '<f8', 'Score': '<i2', 'Probability': '<f4'}
+COLUMN_DTYPES.update({f'{body}_RA': '<f4' for body in BODY_NAMES})
+COLUMN_DTYPES.update({f'{body}_Dec': '<f4' for body in BODY_NAMES})
+
+# Function to read meta.json of a columnar directory, or None if there is none yet
+def read_meta(path):
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as meta_file:
+        return json.load(meta_file)
+
+# Function to replace meta.json atomically; this is the commit point of an append
+def write_meta(path, meta):
+    meta_path = os.path.join(path, "meta.json")
+    with open(meta_path + ".tmp", 'w') as meta_file:
+        json.dump(meta, meta_file, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+
+# Appends chunks of columns to a columnar directory
+class ColumnarWriter:
+    def __init__(self, path, calendar="gregorian", zone=0):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta = read_meta(path)
+        if self.meta is None:
+            self.meta = {'version': FORMAT_VERSION, 'rows': 0, 'calendar': calendar, 'zone': zone, 'columns': COLUMN_DTYPES}
+            write_meta(path, self.meta)
+        for name, value in (('calendar', calendar), ('zone', zone), ('columns', COLUMN_DTYPES)):
+            if self.meta[name] != value:
+                raise ValueError(f"{path} holds results for {name} {self.meta[name]}, not {value}")
+
+        # Drop bytes past the committed row count, left over from an interrupted append
+        self.files = {}
+        for name, dtype in COLUMN_DTYPES.items():
+            column_file = open(os.path.join(path, f"{name}.bin"), 'ab')
+            column_file.truncate(self.meta['rows'] * np.dtype(dtype).itemsize)
+            self.files[name] = column_file
+
+    # Function to append one chunk given as a dict of equal-length arrays keyed like COLUMN_DTYPES
+    def append(self, columns):
+        rows = len(columns['jd'])
+        for name, dtype in COLUMN_DTYPES.items():
+            values = np.ascontiguousarray(columns[name], dtype=dtype)
+            if len(values) != rows:
+                raise ValueError(f"Column {name} has {len(values)} rows, expected {rows}")
+            self.files[name].write(memoryview(values).cast('B'))
+        for column_file in self.files.values():
+            column_file.flush()
+        self.meta['rows'] += rows
+        write_meta(self.path, self.meta)
+
+    def close(self):
+        for column_file in self.files.values():
+            column_file.close()
+
+# Function to memory-map one column file, read-only
+def map_column(path, name, dtype, rows):
+    if rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode='r', shape=(rows,))
+
+# Function to memory-map a columnar directory.
+# Returns (meta, columns) where columns maps each name, derived ones included, to a read-only NumPy view of its file.
+# Derived columns computed for a different row count are stale: they are left out and listed in meta['stale'].
+def open_columns(path):
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError(f"{path} is not a columnar result directory (no meta.json)")
+    columns = {name: map_column(path, name, dtype, meta['rows']) for name, dtype in meta['columns'].items()}
+    meta['stale'] = []
+    for name, derived in meta.get('derived', {}).items():
+        if derived['rows'] != meta['rows']:
+            meta['stale'].append(name)
+            continue
+        columns[name] = map_column(path, name, derived['dtype'], derived['rows'])
+    return meta, columns
+
+# Function to write derived columns in one pass and register them in meta.json once complete.
+# Files are written as <name>.bin.tmp and renamed after the last block, so an interrupted pass leaves
+# the previous columns of the same names intact.
+# dtypes maps each new column name to its dtype, blocks yields dicts of arrays in row order, and
+# info maps column names to extra metadata stored with them (e.g. the rules they were computed with).
+def write_derived_columns(path, dtypes, blocks, info=None):
+    clashes = set(dtypes) & set(COLUMN_DTYPES)
+    if clashes:
+        raise ValueError(f"{sorted(clashes)} are base columns")
+    rows = 0
+    files = {name: open(os.path.join(path, f"{name}.bin.tmp"), 'wb') for name in dtypes}
+    try:
+        for block in blocks:
+            for name, dtype in dtypes.items():
+                files[name].write(memoryview(np.ascontiguousarray(block[name], dtype=dtype)).cast('B'))
+            rows += len(block[next(iter(dtypes))])
+    except BaseException:
+        for column_file in files.values():
+            column_file.close()
+            os.remove(column_file.name)
+        raise
+    for column_file in files.values():
+        column_file.close()
+    for name in dtypes:
+        os.replace(os.path.join(path, f"{name}.bin.tmp"), os.path.join(path, f"{name}.bin"))
+    meta = read_meta(path)
+    derived = meta.setdefault('derived', {})
+    for name, dtype in dtypes.items():
+        derived[name] = dict((info or {}).get(name, {}), dtype=dtype, rows=rows)
+    write_meta(path, meta)
+    return rows
+
+# Function to stack the per-body columns into (rows, bodies) RA and Dec arrays (this copies); rows is a slice
+def positions(columns, bodies=BODY_NAMES, rows=slice(None)):
+    ra = np.stack([columns[f'{body}_RA'][rows] for body in bodies], axis=1)
+    dec = np.stack([columns[f'{body}_Dec'][rows] for body in bodies], axis=1)
+    return ra, dec
+
+# Function to label local Julian date keys with the CSV Date and Time strings
+def jd_labels(jd, calendar="gregorian"):
+    minutes = jd_to_minutes(jd)
+    return grid_labels({'jdn': minutes // 1440, 'minute': minutes % 1440}, calendar)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a columnar result directory.")
+    parser.add_argument("path", help="Directory written with --columnar_output")
+    parser.add_argument("--head", type=int, default=10, help="Number of leading rows to print (default: 10)")
+
+    args = parser.parse_args()
+
+    meta, columns = open_columns(args.path)
+    size = sum(os.path.getsize(os.path.join(args.path, f"{name}.bin")) for name in meta['columns'])
+    print(f"{meta['rows']} rows, {size} bytes ({size / max(meta['rows'], 1):.0f} bytes/row), "
+          f"calendar {meta['calendar']}, zone {meta['zone']}")
+    if meta['stale']:
+        print(f"Stale derived columns (rows appended since they were computed; rescore to refresh): {', '.join(meta['stale'])}")
+    rows = min(args.head, meta['rows'])
+    dates, times = jd_labels(columns['jd'][:rows], meta['calendar'])
+    print(",".join(['Date', 'Time'] + list(meta['columns'])))
+    for row in range(rows):
+        print(",".join([dates[row], times[row]] + [str(columns[name][row]) for name in meta['columns']]))
+
+if __name__ == "__main__":
+    main()
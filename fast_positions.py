@@ -0,0 +1,167 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+fast_positions.py
+
+Optional fast position backend: piecewise Chebyshev fits of each body's position vector,
+computed once from the exact Skyfield path, cached on disk, and evaluated with a few
+multiply-adds per timestamp. Each model records its measured maximum angular error.
+
+#Example command
+python fast_positions.py --start_year 1800 --end_year 1900
+'''
+
+import argparse
+import os
+import threading
+
+import numpy as np
+
+import astro_utils
+from astro_utils import BODY_NAMES, get_planet_vectors_batch, get_timescale, make_time, vectors_to_radec
+from instrumentation import stage, timed
+from time_grid import astronomical_year
+
+CACHE_DIR = os.environ.get('NERAAS_CACHE_DIR', '.neraas_cache')
+SEGMENT_DAYS = 64  # Length of each Chebyshev segment
+DEGREE = 12        # Polynomial degree per segment; enough for Mercury's ~260° of motion per segment
+FIT_BATCH = 2000   # Segments evaluated per Skyfield call while fitting
+
+_models_lock = threading.Lock()
+_models = {}
+
+# Function to compute Chebyshev polynomials T_0..T_degree at x in [-1, 1]; returns shape x.shape + (degree + 1,)
+def chebyshev_basis(x, degree=DEGREE):
+    basis = np.empty(np.shape(x) + (degree + 1,))
+    basis[..., 0] = 1
+    if degree:
+        basis[..., 1] = x
+    for k in range(2, degree + 1):
+        basis[..., k] = 2 * x * basis[..., k - 1] - basis[..., k - 2]
+    return basis
+
+# Function to fit the position vectors of every body on [start_jd, end_jd] (TT).
+# Returns a model dict with 'coefficients' shaped (n_segments, n_bodies, 3, degree + 1).
+def fit_model(start_jd, end_jd, kernel=None, segment_days=SEGMENT_DAYS, degree=DEGREE):
+    ts = get_timescale()
+    n_segments = max(1, int(np.ceil((end_jd - start_jd) / segment_days)))
+    half = segment_days / 2
+
+    # Chebyshev nodes; the fit is then a discrete cosine transform of the sampled vectors
+    theta = np.pi * (np.arange(degree + 1) + 0.5) / (degree + 1)
+    transform = np.cos(np.outer(theta, np.arange(degree + 1))) * 2 / (degree + 1)
+    transform[:, 0] /= 2
+
+    coefficients = np.empty((n_segments, len(BODY_NAMES), 3, degree + 1))
+    for first in range(0, n_segments, FIT_BATCH):
+        segments = np.arange(first, min(first + FIT_BATCH, n_segments))
+        node_jd = (start_jd + (segments[:, None] + 0.5) * segment_days + half * np.cos(theta)).ravel()
+        vectors = get_planet_vectors_batch(ts.tt_jd(node_jd), kernel)
+        vectors = vectors.reshape(len(segments), degree + 1, len(BODY_NAMES), 3)
+        coefficients[segments] = np.einsum('snbc,nk->sbck', vectors, transform)
+
+    model = {
+        'start_jd': start_jd,
+        'segment_days': segment_days,
+        'coefficients': coefficients,
+    }
+    model['max_error_deg'] = measure_error(model, kernel)
+    return model
+
+# Function to evaluate a model at TT Julian dates; returns (n_times, n_bodies, 3) vectors
+@timed('fast_positions')
+def evaluate_vectors(model, jd):
+    jd = np.atleast_1d(jd)
+    offset = (jd - model['start_jd']) / model['segment_days']
+    segments = np.clip(offset.astype(int), 0, len(model['coefficients']) - 1)
+    if np.any(offset < 0) or np.any(offset > len(model['coefficients'])):
+        raise ValueError("Dates fall outside the range the fast position model was fitted on")
+
+    x = 2 * (offset - segments) - 1
+    basis = chebyshev_basis(x, model['coefficients'].shape[-1] - 1)
+    return np.einsum('tk,tbck->tbc', basis, model['coefficients'][segments])
+
+# Function to measure the largest angular error (degrees) of a model against the exact path.
+# Samples every segment at random offsets, i.e. between the fit nodes where the error peaks.
+def measure_error(model, kernel=None, samples_per_segment=3, seed=0):
+    n_segments = len(model['coefficients'])
+    rng = np.random.default_rng(seed)
+    offsets = np.repeat(np.arange(n_segments), samples_per_segment) + rng.random(n_segments * samples_per_segment)
+
+    max_error = 0.0
+    for first in range(0, len(offsets), FIT_BATCH * samples_per_segment):
+        jd = model['start_jd'] + offsets[first:first + FIT_BATCH * samples_per_segment] * model['segment_days']
+        exact = get_planet_vectors_batch(get_timescale().tt_jd(jd), kernel)
+        approx = evaluate_vectors(model, jd)
+        cross = np.linalg.norm(np.cross(exact, approx), axis=-1)
+        dot = np.sum(exact * approx, axis=-1)
+        max_error = max(max_error, float(np.degrees(np.arctan2(cross, dot)).max()))
+    return max_error
+
+# Function to get the model covering a year range: from memory, from the disk cache, or freshly fitted
+def get_model(start_year, end_year, kernel=None):
+    kernel = kernel or astro_utils.DEFAULT_EPHEMERIS
+    key = (start_year, end_year, kernel)
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = _models[key] = load_or_fit_model(start_year, end_year, kernel)
+    return model
+
+# Function to load a cached model from CACHE_DIR or fit and save it.
+# Years are astronomical (as in Skyfield); the range is padded by 60 days on each side to absorb
+# time zone offsets and Julian-calendar grids, which run up to ~40 days off Gregorian by 3000 BCE.
+def load_or_fit_model(start_year, end_year, kernel):
+    cache_path = os.path.join(CACHE_DIR, f"fast_{os.path.basename(kernel)}_{start_year}_{end_year}_{SEGMENT_DAYS}_{DEGREE}.npz")
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return {name: cached[name] if name == 'coefficients' else cached[name].item() for name in cached.files}
+
+    ts = get_timescale()
+    with stage('fast_model_fit'):
+        model = fit_model(ts.utc(start_year, 1, 1).tt - 60, ts.utc(end_year + 1, 1, 1).tt + 60, kernel)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    np.savez(cache_path + ".tmp.npz", **model)
+    os.replace(cache_path + ".tmp.npz", cache_path)
+    print(f"Fast position model for {start_year} to {end_year}: max angular error {model['max_error_deg']:.2e}°")
+    return model
+
+# Function with the same contract as astro_utils.get_planet_positions_batch, served by a fitted model
+def get_planet_positions_fast(model, dates):
+    jd = make_time(get_timescale(), dates).tt
+    return vectors_to_radec(evaluate_vectors(model, jd))
+
+# Main function: fit (or load) a model and report its error bound
+def main():
+    parser = argparse.ArgumentParser(description="Fit the fast position model for a year range and report its error.")
+    parser.add_argument("--start_year", type=int, required=True, help="Start year (e.g., -1000 for 1000 BCE)")
+    parser.add_argument("--end_year", type=int, required=True, help="End year (e.g., 2023)")
+    parser.add_argument("--ephemeris", help="JPL kernel to load, e.g. de421.bsp (default: de406.bsp or $NERAAS_EPHEMERIS)")
+
+    args = parser.parse_args()
+    if 0 in (args.start_year, args.end_year):
+        parser.error("there is no year 0; use -1 for 1 BCE")
+
+    # get_model takes astronomical years, like generate_data.py --fast passes them, so the cached model is shared
+    model = get_model(int(astronomical_year(args.start_year)), int(astronomical_year(args.end_year)), args.ephemeris)
+    max_error = model['max_error_deg']
+    print(f"Maximum angular error: {max_error:.2e}° per body, {2 * max_error:.2e}° per pair separation")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+gap_fill.py
+
+Incremental generation support for generate_data.py --incremental: reads which local minutes
+an existing CSV, result store or columnar directory already covers, drops them from the time
+grid, and merges the newly computed rows into the outputs in time order without duplicates.
+Rows are matched on exact integer minute keys (Julian Day Number * 1440 + minute of the day).
+Coverage is kept as runs of consecutive grid points, so it stays small however many rows there are.
+'''
+
+import os
+import shutil
+from itertools import islice
+
+import numpy as np
+
+from columnar_store import COLUMN_DTYPES, ColumnarWriter, open_columns
+from result_store import jd_to_minutes, label_to_jd
+
+MERGE_BLOCK_ROWS = 1 << 20  # Rows per block when merging columnar directories
+COVERAGE_BLOCK_ROWS = 1 << 16  # Rows (or grid steps, for the result store) per block when reading coverage
+
+# Function to compute the minute keys of a time grid
+def grid_keys(grid):
+    return grid['jdn'] * 1440 + grid['minute']
+
+# Function to compute the minute key of one CSV row's Date and Time; cache maps dates to their JDN
+def label_key(date_str, time_str, cache, calendar="gregorian"):
+    jdn = cache.get(date_str)
+    if jdn is None:
+        jdn = cache[date_str] = round(label_to_jd(date_str, "00:00", calendar) + 0.5)
+    return jdn * 1440 + int(time_str[:2]) * 60 + int(time_str[3:5])
+
+# Function to collapse minute keys into runs of consecutive grid points, as (starts, ends) arrays.
+# Keys that are not grid points (first_key + a multiple of step, up to last_key) are dropped first.
+def key_runs(keys, first_key, last_key, step):
+    keys = np.unique(keys[(keys >= first_key) & (keys <= last_key) & ((keys - first_key) % step == 0)])
+    if len(keys) == 0:
+        return keys, keys
+    breaks = np.flatnonzero(np.diff(keys) != step) + 1
+    return keys[np.r_[0, breaks]], keys[np.r_[breaks - 1, len(keys) - 1]]
+
+# Function to join runs (any order, possibly overlapping) into sorted disjoint runs of grid points
+def join_runs(runs, step):
+    runs = [run for run in runs if len(run[0])]
+    if not runs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts, ends = np.concatenate([run[0] for run in runs]), np.concatenate([run[1] for run in runs])
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], np.maximum.accumulate(ends[order])
+    joined = np.flatnonzero(starts[1:] > ends[:-1] + step) + 1  # Runs that start a new disjoint run
+    return starts[np.r_[0, joined]], ends[np.r_[joined - 1, len(ends) - 1]]
+
+# Function to compute the minute keys of a block of CSV lines
+def csv_keys(lines, cache, calendar="gregorian"):
+    labels = [line.split(',', 2) for line in lines]
+    jdn = np.fromiter((cache[label[0]] if label[0] in cache else label_key(label[0], "00:00", cache, calendar) // 1440
+                       for label in labels), dtype=np.int64, count=len(labels))
+    times = np.frombuffer(''.join(label[1][:5] for label in labels).encode(), dtype=np.uint8).reshape(-1, 5).astype(np.int64) - ord('0')
+    return jdn * 1440 + times[:, 0] * 600 + times[:, 1] * 60 + times[:, 3] * 10 + times[:, 4]
+
+# Function to read which grid points (first_key + a multiple of step, up to last_key) a CSV written by
+# generate_data.py covers, as runs. The file is streamed in blocks, so memory does not grow with its size.
+# Incremental merges stream the file in order, so a CSV that is not in time order is refused.
+def csv_coverage(csv_output, first_key, last_key, step, calendar="gregorian"):
+    runs = []
+    if os.path.exists(csv_output):
+        cache = {}
+        previous = None
+        with open(csv_output) as csvfile:
+            next(csvfile, None)  # Header
+            while lines := list(islice(csvfile, COVERAGE_BLOCK_ROWS)):
+                keys = csv_keys(lines, cache, calendar)
+                if np.any(np.diff(keys) < 0) or (previous is not None and keys[0] < previous):
+                    raise ValueError(f"{csv_output} is not in time order; incremental mode needs a CSV written by generate_data.py")
+                previous = keys[-1]
+                runs.append(key_runs(keys, first_key, last_key, step))
+    return join_runs(runs, step)
+
+# Function to read which grid points a result store covers, as runs. SQLite counts the keys per block,
+# and only blocks with holes have their keys read.
+def store_coverage(store, first_key, last_key, step):
+    runs = []
+    for first, last, count in store.minute_blocks(first_key, last_key, step, COVERAGE_BLOCK_ROWS):
+        if last - first == (count - 1) * step:  # Keys are unique, so the block has no holes
+            runs.append((np.array([first]), np.array([last])))
+        else:
+            runs.append(key_runs(store.minute_keys((first - 1) / 1440 - 0.5, (last + 1) / 1440 - 0.5), first, last, step))
+    return join_runs(runs, step)
+
+# Function to read which grid points a columnar directory covers, as runs, reading the dates in blocks
+def columnar_coverage(path, first_key, last_key, step):
+    runs = []
+    if os.path.exists(os.path.join(path, "meta.json")):
+        _, columns = open_columns(path)
+        for start in range(0, len(columns['jd']), COVERAGE_BLOCK_ROWS):
+            runs.append(key_runs(jd_to_minutes(columns['jd'][start:start + COVERAGE_BLOCK_ROWS]), first_key, last_key, step))
+    return join_runs(runs, step)
+
+# Function to mark the grid points whose keys fall in the sorted disjoint runs covered
+def covered_mask(keys, covered):
+    starts, ends = covered
+    positions = np.searchsorted(starts, keys, side='right') - 1
+    return (positions >= 0) & (keys <= ends[positions.clip(min=0)]) if len(starts) else np.zeros(len(keys), dtype=bool)
+
+# Function to yield (chunk index, grid) for the grid points missing from any of the coverages.
+# Chunk indices are those of the full grid, so checkpoints stay valid while outputs fill up.
+def missing_chunks(chunks, coverages):
+    for index, grid in enumerate(chunks):
+        keys = grid_keys(grid)
+        missing = np.zeros(len(keys), dtype=bool)
+        for covered in coverages:
+            missing |= ~covered_mask(keys, covered)
+        if missing.any():
+            yield index, {name: values[missing] for name, values in grid.items()}
+
+# Function to merge the sorted rows of new_path (a header-less CSV) into csv_output.
+# Rows keep time order, and a key already present (in the output or earlier in the merge) is skipped.
+def merge_csv(csv_output, new_path, calendar="gregorian", buffer_size=1 << 20):
+    if os.path.getsize(new_path) == 0:
+        os.remove(new_path)
+        return
+    cache = {}
+    last_key = None
+
+    def keyed(lines):
+        for line in lines:
+            yield label_key(*line.split(',', 2)[:2], cache, calendar), line
+
+    with open(csv_output, newline='') as existing, open(new_path, newline='') as new_rows, \
+            open(csv_output + ".tmp", 'w', newline='', buffering=buffer_size) as merged:
+        merged.write(next(existing))  # Header
+        old, new = keyed(existing), keyed(new_rows)
+        old_row, new_row = next(old, None), next(new, None)
+        while old_row or new_row:
+            if new_row is None or (old_row is not None and old_row[0] <= new_row[0]):
+                key, line = old_row
+                old_row = next(old, None)
+            else:
+                key, line = new_row
+                new_row = next(new, None)
+            if key != last_key:
+                merged.write(line)
+                last_key = key
+    os.replace(csv_output + ".tmp", csv_output)
+    os.remove(new_path)
+
+# Function to merge the rows of the columnar directory new_path into path in blocks.
+# Rows keep time order, and a key already present (in the output or earlier in the merge) is skipped.
+def merge_columnar(path, new_path):
+    meta, old_columns = open_columns(path)
+    _, new_columns = open_columns(new_path)
+    if len(new_columns['jd']) == 0:
+        shutil.rmtree(new_path)
+        return
+    shutil.rmtree(path + ".tmp", ignore_errors=True)  # Left over from an interrupted merge
+    old_keys, new_keys = jd_to_minutes(old_columns['jd']), jd_to_minutes(new_columns['jd'])
+    old_order = np.argsort(old_keys, kind='stable')  # Output appended out of order by earlier runs still merges
+
+    merged = ColumnarWriter(path + ".tmp", meta['calendar'], meta['zone'])
+    old_at, new_at, last_key = 0, 0, None
+    while old_at < len(old_keys) or new_at < len(new_keys):
+        # Take at most one block from each side, up to the smaller of their last keys
+        old_block = old_order[old_at:old_at + MERGE_BLOCK_ROWS]
+        new_block = np.arange(new_at, min(new_at + MERGE_BLOCK_ROWS, len(new_keys)))
+        ends = [keys[block[-1]] for keys, block in ((old_keys, old_block), (new_keys, new_block)) if len(block)]
+        boundary = min(ends)
+        old_block = old_block[old_keys[old_block] <= boundary]
+        new_block = new_block[new_keys[new_block] <= boundary]
+        old_at += len(old_block)
+        new_at += len(new_block)
+
+        keys = np.concatenate([old_keys[old_block], new_keys[new_block]])
+        order = np.argsort(keys, kind='stable')  # Existing rows first among equal keys
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = np.diff(keys[order]) != 0
+        if last_key is not None:
+            keep &= keys[order] != last_key
+        rows = order[keep]
+        if len(rows):
+            merged.append({name: np.concatenate([old_columns[name][old_block], new_columns[name][new_block]])[rows]
+                           for name in COLUMN_DTYPES})
+            last_key = keys[rows[-1]]
+    merged.close()
+
+    os.replace(path, path + ".old")
+    os.replace(path + ".tmp", path)
+    shutil.rmtree(path + ".old")
+    shutil.rmtree(new_path)
@@ -17,82 +17,217 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 #Example command
 clear; rm *.csv; python generate_data.py --start_year 2024 --end_year 2025 --interval months --csv_output results.csv; cat results.csv
+python generate_data.py --start_year 1850 --end_year 1869 --interval hours --db_output results.db
+python generate_data.py --start_year 1850 --end_year 1869 --interval hours --columnar_output results.cols
+python generate_data.py --start_year 1850 --end_year 1859 --interval minutes --summary_output summary
 '''
 
 import argparse
-import subprocess
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from itertools import islice
 import csv
+import json
 import os
+import shutil
 
-# Function to run the command and capture output
-def run_command(date, time, output_file):
-    command = [
-        "python", "main.py",
-        "--date", date,
-        "--time", time,
-        "--zone", "-5",
-        "--no_graphic",
-        "--csv_output", output_file,
-        "--append"
-    ]
-    result = subprocess.run(command, capture_output=True, text=True)
-    return date, time, result.stdout.strip()
-
-# Function to generate dates based on interval type (manual for BCE dates)
-def generate_dates(start_year, end_year, interval):
-    current_year = start_year
-    current_month = 1
-    current_day = 1
-    current_hour = 0
-    current_minute = 0
-
-    while current_year <= end_year:
-        if current_year < 0:
-            date = f"{abs(current_year):04d}-{current_month:02d}-{current_day:02d} BCE"
-        else:
-            date = f"{current_year:04d}-{current_month:02d}-{current_day:02d}"
-
-        yield date, f"{current_hour:02d}:{current_minute:02d}"
-
-        # Increment the date based on the interval
-        current_year, current_month, current_day, current_hour, current_minute = increment_date(
-            current_year, current_month, current_day, current_hour, current_minute, interval
-        )
-
-# Helper function to increment date manually
-def increment_date(year, month, day, hour, minute, interval):
-    if interval == "minutes":
-        minute += 1
-        if minute == 60:
-            minute = 0
-            hour += 1
-    elif interval == "hours":
-        hour += 1
-        if hour == 24:
-            hour = 0
-            day += 1
-    elif interval == "days":
-        day += 1
-        if day > 30:  # Simplified, adjust as needed for actual month length
-            day = 1
-            month += 1
-    elif interval == "months":
-        month += 1
-        if month > 12:
-            month = 1
-            year += 1
-    elif interval == "seasons":
-        month += 3
-        if month > 12:
-            month = (month % 12)
-            year += 1
-    elif interval == "years":
-        year += 1
-
-    return year, month, day, hour, minute
+from astro_utils import BODY_NAMES, DEFAULT_EPHEMERIS, get_ephemeris, get_planet_positions_batch, get_all_angles_batch, get_timescale, set_ephemeris
+from interference_predictor import get_aspect_index, predict_interference_batch
+from fast_positions import get_model, get_planet_positions_fast
+from instrumentation import Progress, collect, enable, merge, report, stage, start_profile, stop_profile
+from result_store import ResultStore, local_jd
+from columnar_store import ColumnarWriter
+from summaries import SummaryAggregator
+from gap_fill import columnar_coverage, csv_coverage, grid_keys, merge_columnar, merge_csv, missing_chunks, store_coverage
+from time_grid import CALENDARS, INTERVAL_MINUTES, INTERVAL_MONTHS, astronomical_year, build_grid, grid_labels, grid_size, grid_to_time, iter_time_grid
+
+WRITE_BUFFER_SIZE = 1 << 20  # Bytes buffered by the CSV writers before each flush
+
+# Function to compute one chunk of the time grid in-process.
+# Returns a dict of columns: local 'jd' keys and 'date'/'time' strings plus 'score', 'probability', 'ra' and 'dec' arrays.
+# fast_range is a (start_year, end_year) pair selecting the fast position model instead of the exact path.
+# With aspects set, 'aspects' also holds the get_aspect_index band of every pair, for the summaries.
+def compute_chunk(grid, zone, calendar="gregorian", fast_range=None, aspects=False):
+    with stage('time_grid'):
+        t = grid_to_time(get_timescale(), grid, zone)
+        dates, times = grid_labels(grid, calendar)
+
+    if fast_range:
+        ra, dec, distance = get_planet_positions_fast(get_model(*fast_range), t)
+    else:
+        ra, dec, distance = get_planet_positions_batch(t)
+    angles = get_all_angles_batch(ra, dec)
+    scores, probabilities = predict_interference_batch(angles)
+
+    chunk = {
+        'jd': local_jd(grid['jdn'], grid['minute']).tolist(),
+        'date': dates,
+        'time': times,
+        'score': scores.tolist(),
+        'probability': probabilities.tolist(),
+        'ra': ra,
+        'dec': dec,
+    }
+    if aspects:
+        chunk['aspects'] = get_aspect_index(angles).astype('int8')
+    return chunk
+
+# Function to describe the first and last local dates of a grid chunk for error messages
+def chunk_span(grid, calendar="gregorian"):
+    dates, _ = grid_labels({name: values[[0, -1]] for name, values in grid.items()}, calendar)
+    return f"{dates[0]} to {dates[1]}"
+
+# Function to turn a computed chunk into CSV rows
+def chunk_rows(chunk):
+    for row, (date, time) in enumerate(zip(chunk['date'], chunk['time'])):
+        yield ([date, time, chunk['score'][row], chunk['probability'][row]]
+               + [round(ra, 2) for ra in chunk['ra'][row].tolist()]
+               + [round(dec, 2) for dec in chunk['dec'][row].tolist()])
+
+# Function to turn a computed chunk into result store rows
+def chunk_records(chunk):
+    return list(zip(chunk['jd'], chunk['date'], chunk['time'], chunk['score'], chunk['probability'],
+                    *chunk['ra'].T.tolist(), *chunk['dec'].T.tolist()))
+
+# Function to turn a computed chunk into the typed columns of a columnar directory
+def chunk_columns(chunk, bodies=BODY_NAMES):
+    columns = {'jd': chunk['jd'], 'Score': chunk['score'], 'Probability': chunk['probability']}
+    for column, body in enumerate(bodies):
+        columns[f'{body}_RA'] = chunk['ra'][:, column]
+        columns[f'{body}_Dec'] = chunk['dec'][:, column]
+    return columns
+
+# Function to write a computed chunk to the binary outputs (result store and/or columnar directory)
+def write_binary_outputs(chunk, store=None, columnar=None):
+    if store:
+        with stage('db_write'):
+            store.insert(chunk_records(chunk))
+    if columnar:
+        with stage('columnar_write'):
+            columnar.append(chunk_columns(chunk))
+
+# Function to load the ephemeris once in each worker process
+def init_worker(kernel, timing=False):
+    enable(timing)
+    set_ephemeris(kernel)
+    get_ephemeris()
+
+# Function to compute one shard in a worker and write it to its own part file (when write_part is set),
+# plus its summaries to summary-<index>.json when threshold (the high-probability threshold) is given.
+# Files are written under a temporary name and renamed, so a crash never leaves a partial one behind.
+# Returns the shard index, the worker's stage timings since the previous shard, and the computed
+# chunk when return_chunk is set (the parent process is the only writer of the binary outputs).
+def compute_shard(index, grid, zone, parts_dir, calendar="gregorian", fast_range=None, write_part=True, return_chunk=False,
+                  threshold=None):
+    chunk = compute_chunk(grid, zone, calendar, fast_range, aspects=threshold is not None)
+    if threshold is not None:
+        summary = SummaryAggregator(calendar, threshold)
+        with stage('summaries'):
+            summary.update(grid, chunk)
+        summary_path = os.path.join(parts_dir, f"summary-{index:06d}.json")
+        with open(summary_path + ".tmp", 'w') as summary_file:
+            json.dump(summary.to_state(), summary_file)
+        os.replace(summary_path + ".tmp", summary_path)
+        del chunk['aspects']
+    if write_part:
+        part_path = os.path.join(parts_dir, f"part-{index:06d}.csv")
+        with stage('csv_write'), open(part_path + ".tmp", 'w', newline='', buffering=WRITE_BUFFER_SIZE) as csvfile:
+            csv.writer(csvfile).writerows(chunk_rows(chunk))
+        os.replace(part_path + ".tmp", part_path)
+    return index, collect(), chunk if return_chunk else None
+
+# Function to read the checkpoint manifest; returns the completed shard indices if it matches this run
+def load_manifest(manifest_path, run):
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+    if manifest['run'] != run:
+        print(f"Checkpoint {manifest_path} belongs to a different run, starting over")
+        return set()
+    return set(manifest['completed'])
+
+# Function to record completed shards, replacing the manifest atomically
+def save_manifest(manifest_path, run, completed):
+    with open(manifest_path + ".tmp", 'w') as manifest_file:
+        json.dump({'run': run, 'completed': sorted(completed)}, manifest_file)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+# Function to run the (index, grid) shards on a process pool with resumable checkpoints.
+# Part files and manifest live in <csv_output>.parts; at most two shards per worker are in flight.
+# With binary outputs, each shard's rows are written, in shard order, before the shard is marked done;
+# after a failed shard, later shards are not appended to a columnar directory, so it never has a gap.
+# Returns True when every shard is done and the parts can be merged.
+def run_sharded(chunks, args, run, parts_dir, fast_range=None, progress=None, store=None, columnar=None):
+    manifest_path = os.path.join(parts_dir, "manifest.json")
+    completed = load_manifest(manifest_path, run)
+    if completed:
+        print(f"Resuming: {len(completed)} shards already done")
+    else:
+        shutil.rmtree(parts_dir, ignore_errors=True)  # Parts of another run must not be merged into this one
+    os.makedirs(parts_dir, exist_ok=True)
+
+    failed = False
+    gap = False  # Set once the in-order writer passes a failed shard
+    workers = args.workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(run['ephemeris'], args.timing)) as executor:
+        in_flight, ready, order = {}, {}, deque()  # order holds the submitted shard indices, oldest first
+        pending = ((index, chunk) for index, chunk in chunks if index not in completed)
+        while True:
+            for index, chunk in islice(pending, 2 * workers - len(in_flight) - len(ready)):
+                in_flight[executor.submit(compute_shard, index, chunk, args.zone, parts_dir, args.calendar, fast_range,
+                                          bool(args.csv_output), bool(store or columnar),
+                                          args.high_probability if args.summary_output else None)] = (index, chunk)
+                order.append(index)
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, chunk = in_flight.pop(future)
+                try:
+                    _, stats, computed = future.result()
+                    ready[index] = (True, computed)
+                    merge(stats)
+                    if progress:
+                        progress.update(len(chunk['jdn']))
+                except Exception as e:
+                    ready[index] = (False, None)
+                    failed = True
+                    print(f"Error processing dates {chunk_span(chunk, args.calendar)}: {e}")
+
+            while order and order[0] in ready:
+                index = order.popleft()
+                succeeded, computed = ready.pop(index)
+                if not succeeded:
+                    gap = True
+                    continue
+                if gap and columnar:
+                    continue
+                if computed:
+                    write_binary_outputs(computed, store, columnar)
+                completed.add(index)
+            save_manifest(manifest_path, run, completed)
+
+    if failed:
+        print(f"Some shards failed; re-run the same command to resume from {manifest_path}")
+    return not failed
+
+# Function to append the part files to the CSV in shard order, then remove the checkpoint directory
+def merge_parts(parts_dir, csv_output):
+    part_names = sorted(name for name in os.listdir(parts_dir) if name.startswith("part-") and name.endswith(".csv"))
+    with open(csv_output, 'a', newline='', buffering=WRITE_BUFFER_SIZE) as csvfile:
+        for part_name in part_names:
+            with open(os.path.join(parts_dir, part_name), newline='') as part_file:
+                shutil.copyfileobj(part_file, csvfile, WRITE_BUFFER_SIZE)
+    shutil.rmtree(parts_dir)
+
+# Function to merge the shard summaries of a finished parallel run into summaries, in shard order
+def merge_summary_parts(parts_dir, summaries):
+    for name in sorted(name for name in os.listdir(parts_dir) if name.startswith("summary-") and name.endswith(".json")):
+        with open(os.path.join(parts_dir, name)) as summary_file:
+            summaries.merge(SummaryAggregator.from_state(json.load(summary_file)))
 
 # Helper function to write CSV header
 def write_csv_header(csv_output):
@@ -106,75 +241,172 @@ def write_csv_header(csv_output):
             ]
             writer.writerow(header)
 
-# Function to parse and clean the output
-def clean_output(output):
-    if "Score:" in output or "Converted UTC Time:" in output:
-        return None  # Filter out unwanted log messages
-    return output.strip() if isinstance(output, str) else None
-
-# Function to convert BCE/CE date to sortable tuple (year, month, day)
-def parse_bce_ce_date(date_str):
-    if "BCE" in date_str:
-        year, month, day = date_str.split(" ")[0].split("-")
-        year = -int(year)  # Convert BCE year to negative
-    else:
-        year, month, day = date_str.split("-")
-        year = int(year)  # CE year remains positive
-    return (year, int(month), int(day))
+# Function to read what each output already covers, as runs of grid points, for --incremental.
+# Month-based grids fall on midnights, so their coverage is read on the daily grid.
+def read_coverages(args, store=None):
+    first = grid_keys(build_grid(args.start_year, args.interval, 0, 1, args.calendar))[0]
+    last_index = grid_size(args.start_year, args.end_year, args.interval, args.calendar) - 1
+    last = grid_keys(build_grid(args.start_year, args.interval, last_index, last_index + 1, args.calendar))[0]
+    step = INTERVAL_MINUTES.get(args.interval, INTERVAL_MINUTES['days'])
+    coverages = []
+    if args.csv_output:
+        coverages.append(csv_coverage(args.csv_output, first, last, step, args.calendar))
+    if store:
+        coverages.append(store_coverage(store, first, last, step))
+    if args.columnar_output:
+        coverages.append(columnar_coverage(args.columnar_output, first, last, step))
+    return coverages
 
-# Main function
-def main():
-    parser = argparse.ArgumentParser(description="Generate data in intervals.")
-    parser.add_argument("--start_year", type=int, required=True, help="Start year (e.g., -1000 for 1000 BCE)")
-    parser.add_argument("--end_year", type=int, required=True, help="End year (e.g., 2023)")
-    parser.add_argument("--interval", type=str, required=True, choices=["minutes", "hours", "days", "months", "seasons", "years"], help="Interval type (minutes, hours, days, months, seasons, years)")
-    parser.add_argument("--csv_output", required=True, help="CSV output file name")
-    parser.add_argument("--parallel", action="store_true", help="Enable parallel processing (disabled by default)")
+# Function to run one generation as configured by the parsed arguments
+def generate(args):
+    if args.ephemeris:
+        set_ephemeris(args.ephemeris)
 
-    args = parser.parse_args()
+    # Fit or load the fast model up front so workers only read it from the disk cache (its years are astronomical)
+    fast_range = None
+    if args.fast:
+        fast_range = (int(astronomical_year(args.start_year)), int(astronomical_year(args.end_year)))
+        print(f"Fast position model max angular error: {get_model(*fast_range)['max_error_deg']:.2e}°")
+
+    run = {
+        'start_year': args.start_year, 'end_year': args.end_year, 'interval': args.interval,
+        'zone': args.zone, 'chunk_size': args.chunk_size, 'ephemeris': args.ephemeris or DEFAULT_EPHEMERIS,
+        'fast': args.fast, 'calendar': args.calendar, 'csv': bool(args.csv_output), 'db': bool(args.db_output),
+        'columnar': bool(args.columnar_output), 'incremental': args.incremental,
+        'summary': args.high_probability if args.summary_output else None,
+    }
+    parts_dir = (args.csv_output or args.db_output or (args.columnar_output or args.summary_output).rstrip(os.sep)) + ".parts"
 
     # Write CSV header once
-    write_csv_header(args.csv_output)
+    if args.csv_output:
+        write_csv_header(args.csv_output)
+
+    # In incremental mode, new CSV and columnar rows are staged in <output>.new and merged in at the end.
+    # The columnar staging is kept only while a parallel run resumes from its checkpoint.
+    csv_target, columnar_target = args.csv_output, args.columnar_output
+    if args.incremental:
+        if args.csv_output:
+            csv_target = args.csv_output + ".new"
+            if os.path.exists(csv_target):
+                os.remove(csv_target)
+        if args.columnar_output:
+            ColumnarWriter(args.columnar_output, args.calendar, args.zone).close()  # Creates it, or checks calendar and zone
+            columnar_target = args.columnar_output.rstrip(os.sep) + ".new"
+            if not (args.parallel and load_manifest(os.path.join(parts_dir, "manifest.json"), run)):
+                shutil.rmtree(columnar_target, ignore_errors=True)
+
+    store = ResultStore(args.db_output, args.calendar, args.zone) if args.db_output else None
+    columnar = ColumnarWriter(columnar_target, args.calendar, args.zone) if columnar_target else None
+    summaries = SummaryAggregator(args.calendar, args.high_probability) if args.summary_output else None
+    try:
+        finished = run_generation(args, run, parts_dir, csv_target, fast_range, store, columnar, summaries)
+    finally:
+        if store:
+            store.close()
+        if columnar:
+            columnar.close()
+
+    if args.incremental and finished:
+        with stage('merge_outputs'):
+            if args.csv_output and os.path.exists(csv_target):
+                merge_csv(args.csv_output, csv_target, args.calendar, WRITE_BUFFER_SIZE)
+            if args.columnar_output:
+                merge_columnar(args.columnar_output, columnar_target)
+    if summaries and finished:
+        with stage('summaries'):
+            summaries.write(args.summary_output, args.rolling_days)
+        print(f"Summaries written to {args.summary_output}_*.csv")
 
-    # Initialize the results list
-    results = []
+# Function to compute the grid and write it to the CSV (csv_target) and binary outputs, updating summaries if given.
+# Returns False when a parallel run left shards to resume.
+def run_generation(args, run, parts_dir, csv_target, fast_range=None, store=None, columnar=None, summaries=None):
+    chunks = enumerate(iter_time_grid(args.start_year, args.end_year, args.interval, args.chunk_size, args.calendar))
+    total = grid_size(args.start_year, args.end_year, args.interval, args.calendar)
+    if args.incremental:
+        with stage('coverage'):
+            coverages = read_coverages(args, store)
+        chunks = missing_chunks((chunk for _, chunk in chunks), coverages)
+        total = None  # Unknown until the grid has been checked against the coverage
+    progress = Progress(total)
 
     # Check if parallel processing is enabled
     if args.parallel:
-        # Use parallel processing
-        with ThreadPoolExecutor() as executor:
-            future_to_date = {executor.submit(run_command, date, time, args.csv_output): (date, time)
-                            for date, time in generate_dates(args.start_year, args.end_year, args.interval)}
+        # Use sharded parallel processing; the parts are already in time order
+        finished = run_sharded(chunks, args, run, parts_dir, fast_range, progress, store, columnar)
+        if finished:
+            if summaries:
+                merge_summary_parts(parts_dir, summaries)
+            if csv_target:
+                with stage('merge_parts'):
+                    merge_parts(parts_dir, csv_target)
+            else:
+                shutil.rmtree(parts_dir)
+        progress.print_line()
+        return finished
 
-            for future in as_completed(future_to_date):
-                date, time = future_to_date[future]
-                try:
-                    result = future.result()
-                    cleaned_result = clean_output(result[2])
-                    if cleaned_result:
-                        results.append((date, time, cleaned_result))
-                except Exception as e:
-                    print(f"Error processing date {date}: {e}")
-    else:
-        # Use sequential processing
-        for date, time in generate_dates(args.start_year, args.end_year, args.interval):
+    # Use sequential processing; chunks come out in time order and stream through one buffered writer
+    csv_context = open(csv_target, 'a', newline='', buffering=WRITE_BUFFER_SIZE) if csv_target else nullcontext()
+    with csv_context as csvfile:
+        writer = csv.writer(csvfile) if csvfile else None
+        for _, chunk in chunks:
             try:
-                result = run_command(date, time, args.csv_output)
-                cleaned_result = clean_output(result[2])
-                if cleaned_result:
-                    results.append((date, time, cleaned_result))
+                computed = compute_chunk(chunk, args.zone, args.calendar, fast_range, aspects=bool(summaries))
+                if summaries:
+                    with stage('summaries'):
+                        summaries.update(chunk, computed)
+                if writer:
+                    with stage('csv_write'):
+                        writer.writerows(chunk_rows(computed))
+                write_binary_outputs(computed, store, columnar)
+                progress.update(len(chunk['jdn']))
             except Exception as e:
-                print(f"Error processing date {date}: {e}")
+                print(f"Error processing dates {chunk_span(chunk, args.calendar)}: {e}")
+    progress.print_line()
+    return True
 
-    # Sort results by date and time before writing
-    results.sort(key=lambda x: (parse_bce_ce_date(x[0]), x[1]))
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Generate data in intervals.")
+    parser.add_argument("--start_year", type=int, required=True, help="Start year (e.g., -1000 for 1000 BCE)")
+    parser.add_argument("--end_year", type=int, required=True, help="End year (e.g., 2023)")
+    parser.add_argument("--interval", type=str, required=True, choices=list(INTERVAL_MINUTES) + list(INTERVAL_MONTHS), help="Interval type (minutes, hours, days, months, seasons, years)")
+    parser.add_argument("--csv_output", help="CSV output file name")
+    parser.add_argument("--db_output", help="SQLite result store to write, indexed by local Julian date (see result_store.py)")
+    parser.add_argument("--columnar_output", help="Columnar binary directory to append to, memory-mappable (see columnar_store.py)")
+    parser.add_argument("--summary_output", help="Prefix of the daily/monthly summary tables to write (<prefix>_daily.csv, _monthly.csv, _scores.csv, _aspects.csv)")
+    parser.add_argument("--high_probability", type=float, default=50.0, help="Probability (%%) at or above which rows count as high in the summaries (default: 50)")
+    parser.add_argument("--rolling_days", type=int, default=7, help="Days in the rolling mean Probability of the daily summary (default: 7)")
+    parser.add_argument("--parallel", action="store_true", help="Enable sharded parallel processing with resumable checkpoints (disabled by default)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes for --parallel (default: CPU count)")
+    parser.add_argument("--incremental", action="store_true", help="Compute only the timestamps missing from the existing outputs and merge them in, in time order")
+
+    parser.add_argument("--zone", type=int, default=-5, help="Time zone offset from UTC of the generated local times (default: -5)")
+    parser.add_argument("--calendar", choices=CALENDARS, default="gregorian", help="Proleptic calendar of the generated dates (default: gregorian)")
+    parser.add_argument("--chunk_size", type=int, default=10000, help="Number of timestamps computed per batch (default: 10000)")
+    parser.add_argument("--ephemeris", help="JPL kernel to load, e.g. de421.bsp (default: de406.bsp or $NERAAS_EPHEMERIS)")
+    parser.add_argument("--fast", action="store_true", help="Use the cached Chebyshev position model instead of exact Skyfield evaluation")
+    parser.add_argument("--timing", action="store_true", help="Print per-stage wall/CPU time and call counts at the end")
+    parser.add_argument("--profile", help="Write a cProfile dump of the run to this file")
+
+    args = parser.parse_args()
+    if not (args.csv_output or args.db_output or args.columnar_output or args.summary_output):
+        parser.error("give at least one of --csv_output, --db_output, --columnar_output and --summary_output")
+    if args.summary_output and args.incremental:
+        parser.error("--summary_output needs a full run; it cannot be combined with --incremental")
+    if 0 in (args.start_year, args.end_year):
+        parser.error("there is no year 0; use -1 for 1 BCE")
 
-    # Append sorted results to CSV
-    with open(args.csv_output, 'a', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        for date, time, output in results:
-            output_data = output.split(",")
-            writer.writerow([date, time] + output_data)
+    if args.timing:
+        enable()
+    if args.profile:
+        start_profile()
+    try:
+        generate(args)
+    finally:
+        if args.profile:
+            stop_profile(args.profile)
+        if args.timing:
+            report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,141 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+instrumentation.py
+
+Per-stage wall/CPU timing and call counts, cProfile dumps and progress reporting.
+Timing is off unless enable() is called or NERAAS_TIMING=1 is set; when off, stage()
+returns a shared no-op context and timed() wrappers cost a single flag check.
+'''
+
+import functools
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+ENABLED = os.environ.get('NERAAS_TIMING') == '1'
+
+_stats_lock = threading.Lock()
+_stats = {}  # Stage name -> [calls, wall seconds, CPU seconds]
+_null_stage = nullcontext()
+_profiler = None
+
+def enable(enabled=True):
+    global ENABLED
+    ENABLED = enabled
+
+# Context manager recording one call of a stage
+class _Stage:
+    __slots__ = ('name', 'wall', 'cpu')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+
+# Function to time a block: with stage('positions'): ...
+def stage(name):
+    return _Stage(name) if ENABLED else _null_stage
+
+# Decorator timing every call of a function as the given stage
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record(name, wall, cpu, calls=1):
+    with _stats_lock:
+        totals = _stats.setdefault(name, [0, 0.0, 0.0])
+        totals[0] += calls
+        totals[1] += wall
+        totals[2] += cpu
+
+# Function to take and clear the recorded stats, e.g. to ship them from a worker process
+def collect():
+    global _stats
+    with _stats_lock:
+        stats, _stats = _stats, {}
+    return stats
+
+# Function to add stats collected in another process
+def merge(stats):
+    for name, (calls, wall, cpu) in stats.items():
+        record(name, wall, cpu, calls)
+
+# Function to print the per-stage table; worker stages sum across processes, so they can exceed wall time
+def report():
+    with _stats_lock:
+        stats = sorted(_stats.items(), key=lambda item: -item[1][1])
+    if not stats:
+        return
+    print(f"{'Stage':20s} {'Calls':>10s} {'Wall s':>10s} {'CPU s':>10s} {'ms/call':>10s}")
+    for name, (calls, wall, cpu) in stats:
+        print(f"{name:20s} {calls:10d} {wall:10.3f} {cpu:10.3f} {wall / calls * 1000:10.3f}")
+
+# Functions to capture a cProfile dump (view with snakeviz, or convert for flamegraphs with flameprof)
+def start_profile():
+    global _profiler
+    import cProfile
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+def stop_profile(path):
+    global _profiler
+    if _profiler is None:
+        return
+    _profiler.disable()
+    _profiler.dump_stats(path)
+    _profiler = None
+    print(f"Profile written to {path}")
+
+# Periodic progress line with rows/sec and ETA; total may be an estimate
+class Progress:
+    def __init__(self, total, every_seconds=5.0):
+        self.total = total
+        self.every_seconds = every_seconds
+        self.done = 0
+        self.started = self.last_report = time.perf_counter()
+
+    def update(self, rows):
+        self.done += rows
+        now = time.perf_counter()
+        if now - self.last_report >= self.every_seconds:
+            self.last_report = now
+            self.print_line(now)
+
+    def print_line(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        line = f"Progress: {self.done} rows, {rate:.0f} rows/s"
+        if self.total:
+            remaining = max(self.total - self.done, 0)
+            eta = str(timedelta(seconds=round(remaining / rate))) if rate else 'unknown'
+            line += f", {min(self.done / self.total, 1):.1%} of ~{self.total}, ETA {eta}"
+        print(line)
@@ -17,16 +17,75 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 # interference_predictor.py
 
+import numpy as np
+
+from instrumentation import timed
+
+# Aspect bands: (name, exact angle, low, high, score weight) in degrees, bounds inclusive
+ASPECT_BANDS = [
+    ('conjunction', 0, 0, 10, 10),     # High score for conjunctions and oppositions
+    ('opposition', 180, 170, 180, 10),
+    ('square', 90, 80, 100, 7),        # Moderate score for squares (90°)
+    ('trine', 120, 110, 130, -5),      # Low score for trines (120°) and sextiles (60°)
+    ('sextile', 60, 50, 70, -5),
+]
+PROBABILITY_SCALE = 1.5  # Example scaling factor
+
+# Function to classify angles into ASPECT_BANDS; returns an int array of band indices, -1 where no band applies
+def get_aspect_index(angles):
+    angles = np.asarray(angles)
+    conditions = [(low <= angles) & (angles <= high) for _, _, low, high, _ in ASPECT_BANDS]
+    return np.select(conditions, np.arange(len(ASPECT_BANDS)), default=-1)
+
+# Function to compile bands into a binned angle -> weight lookup table.
+# Bounds stay inclusive and, where bands overlap, the earlier band wins, exactly as in get_aspect_index.
+# Breakpoints: segment i covers [edges[i-1], edges[i]) and scores weights[i]. Bins of bin_width degrees that
+# hold a breakpoint, plus the first and the overflow bin (which also catch NaN), are marked 'mixed'
+# and scored from the breakpoints, so the table gives exactly the same weights as the band test.
+def compile_bands(bands, probability_scale=PROBABILITY_SCALE, bin_width=1 / 16):
+    edges = np.array(sorted({float(low) for _, _, low, _, _ in bands}
+                            | {np.nextafter(float(high), np.inf) for _, _, _, high, _ in bands}))
+    weights = np.array([next((weight for _, _, low, high, weight in bands if low <= start <= high), 0)
+                        for start in np.concatenate([[-np.inf], edges])])
+
+    starts = np.arange(int(180 / bin_width) + 2) * bin_width
+    table = weights[np.searchsorted(edges, starts, side='right')]
+    mixed = np.searchsorted(edges, starts + bin_width, side='left') > np.searchsorted(edges, starts, side='right')
+    mixed[[0, -1]] = True
+    return {'edges': edges, 'weights': weights, 'bin_width': bin_width, 'table': table, 'mixed': mixed,
+            'probability_scale': probability_scale}
+
+DEFAULT_RULES = compile_bands(ASPECT_BANDS)
+
+# Function to score angles with compiled bands; the last axis of angles holds the pairs.
+# Returns score and probability arrays over the leading axes.
+def score_angles(angles, rules=DEFAULT_RULES):
+    angles = np.asarray(angles)
+    table, mixed = rules['table'], rules['mixed']
+    with np.errstate(invalid='ignore'):  # NaN bins are clipped into a mixed bin
+        index = (angles * (1 / rules['bin_width'])).astype(np.intp)
+    np.clip(index, 0, len(table) - 1, out=index)
+    weights = table[index]
+    exact = mixed[index]
+    if exact.any():
+        weights[exact] = rules['weights'][np.searchsorted(rules['edges'], angles[exact], side='right')]
+    scores = weights.sum(axis=-1)
+
+    # Convert score to a probability
+    probabilities = np.clip(scores * rules['probability_scale'], 0, 100)
+    return scores, probabilities
+
+# Function to score many instants at once.
+# angles is a (n_times, n_pairs) array, e.g. from astro_utils.get_all_angles_batch;
+# returns score and probability arrays of length n_times.
+@timed('scoring')
+def predict_interference_batch(angles):
+    return score_angles(np.atleast_2d(angles))
+
 def predict_interference(angles):
-    score = 0
-    for angle_name, angle in angles.items():
-        if 0 <= angle <= 10 or 170 <= angle <= 180:
-            score += 10  # High score for conjunctions and oppositions
-        elif 80 <= angle <= 100:
-            score += 7  # Moderate score for squares (90°)
-        elif 110 <= angle <= 130 or 50 <= angle <= 70:
-            score -= 5  # Low score for trines (120°) and sextiles (60°)
+    scores, _ = predict_interference_batch([list(angles.values())])
+    score = int(scores[0])
 
     # Convert score to a probability
-    probability = min(100, max(0, score * 1.5))  # Example scaling factor
+    probability = min(100, max(0, score * PROBABILITY_SCALE))
     return score, probability
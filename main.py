@@ -20,41 +20,25 @@ main.py
 python main.py --date "1859-09-01" --time "11:55" --zone -5 --no_graphic
 python main.py --date "1859-09-01" --time "11:55" --zone -5 --csv_output results.csv
 python main.py --date "1859-09-01" --time "11:55" --zone -5 --no_graphic --csv_output results.csv
+python main.py --date "1859-09-01" --time "11:55" --zone -5 --no_graphic --db_output results.db
+python main.py --date "1859-09-01" --time "11:55" --zone -5 --no_graphic --columnar_output results.cols
 '''
 import warnings
-from datetime import datetime, timedelta
+from datetime import timedelta
 import argparse
 import csv
 
 # Suppress specific warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="matplotlib")
 
-# Ensure required modules are installed
-from module_check_install import check_required_modules
-check_required_modules()
-
-from visualization import plot_planet_positions_polar
-from astro_utils import get_planet_positions, get_all_angles
+from astro_utils import get_planet_positions, get_all_angles, parse_date, set_ephemeris
 from interference_predictor import predict_interference
+from instrumentation import enable, report, stage, start_profile, stop_profile
 
-# Function to handle parsing of dates, including BCE dates
-def parse_date(date_str, time_str):
-    if "BCE" in date_str:
-        year_str, month_day_str = date_str.split("-")[0], date_str[5:10]
-        year = -int(year_str)
-        date_str = f"{abs(year):04d}-{month_day_str}"
-    return datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
-
-def main():
-    parser = argparse.ArgumentParser(description="Your program description")
-    parser.add_argument("--date", required=True, help="Date in the format YYYY-MM-DD")
-    parser.add_argument("--time", required=True, help="Time in the format HH:MM")
-    parser.add_argument("--zone", required=True, type=int, help="Time zone offset from UTC")
-    parser.add_argument("--no_graphic", action="store_true", help="Disable graphics")
-    parser.add_argument("--csv_output", help="CSV output file")
-    parser.add_argument("--append", action="store_true", help="Append to CSV file if exists")
-
-    args = parser.parse_args()
+# Function to run one prediction as configured by the parsed arguments
+def predict(args):
+    if args.ephemeris:
+        set_ephemeris(args.ephemeris)
 
     # Combine date and time using the custom parse_date function
     try:
@@ -84,7 +68,7 @@ def main():
     # Step 3: Save results to CSV if requested
     if args.csv_output:
         mode = 'a' if args.append else 'w'
-        with open(args.csv_output, mode=mode, newline='') as file:
+        with stage('csv_write'), open(args.csv_output, mode=mode, newline='') as file:
             writer = csv.writer(file)
             if not args.append or file.tell() == 0:  # Write header if not appending or file is empty
                 headers = ['Date', 'Time', 'Score', 'Probability']
@@ -98,9 +82,75 @@ def main():
             writer.writerow(data)
         print(f"Results {'appended to' if args.append else 'saved to'} {args.csv_output}")
 
+    # Step 3b: Add the row to a result store and/or columnar directory if requested
+    # The key comes from the signed date label (via astronomical years), never from the datetime, so BCE sorts correctly
+    if args.db_output or args.columnar_output:
+        from result_store import label_to_jd
+        jd = label_to_jd(args.date, args.time, "gregorian")
+    if args.db_output:
+        from result_store import ResultStore
+        store = ResultStore(args.db_output, "gregorian", args.zone)
+        try:
+            with stage('db_write'):
+                store.insert([(float(jd), args.date, args.time, score, probability)
+                              + tuple(ra for ra, _ in ra_dec_info.values())
+                              + tuple(dec for _, dec in ra_dec_info.values())])
+        finally:
+            store.close()
+        print(f"Results saved to {args.db_output}")
+    if args.columnar_output:
+        from columnar_store import ColumnarWriter
+        columns = {'jd': [jd], 'Score': [score], 'Probability': [probability]}
+        columns.update({f'{planet}_RA': [ra] for planet, (ra, _) in ra_dec_info.items()})
+        columns.update({f'{planet}_Dec': [dec] for planet, (_, dec) in ra_dec_info.items()})
+        writer = ColumnarWriter(args.columnar_output, "gregorian", args.zone)
+        try:
+            with stage('columnar_write'):
+                writer.append(columns)
+        finally:
+            writer.close()
+        print(f"Results appended to {args.columnar_output}")
+
     # Step 4: Plot planetary positions if not disabled
     if not args.no_graphic:
-        plot_planet_positions_polar(planet_positions, score, probability, ra_dec_info, args.date, args.time)
+        from visualization import plot_planet_positions_polar  # Loads matplotlib only when a plot is drawn
+        with stage('plot'):
+            plot_planet_positions_polar(planet_positions, score, probability, ra_dec_info, args.date, args.time)
+
+def main():
+    parser = argparse.ArgumentParser(description="Your program description")
+    parser.add_argument("--date", required=True, help="Date in the format YYYY-MM-DD (CE; use generate_data.py for BCE dates)")
+    parser.add_argument("--time", required=True, help="Time in the format HH:MM")
+    parser.add_argument("--zone", required=True, type=int, help="Time zone offset from UTC")
+    parser.add_argument("--no_graphic", action="store_true", help="Disable graphics")
+    parser.add_argument("--csv_output", help="CSV output file")
+    parser.add_argument("--append", action="store_true", help="Append to CSV file if exists")
+    parser.add_argument("--db_output", help="SQLite result store to add the result to (see result_store.py)")
+    parser.add_argument("--columnar_output", help="Columnar binary directory to append the result to (see columnar_store.py)")
+    parser.add_argument("--ephemeris", help="JPL kernel to load, e.g. de421.bsp (default: de406.bsp or $NERAAS_EPHEMERIS)")
+    parser.add_argument("--timing", action="store_true", help="Print per-stage wall/CPU time and call counts at the end")
+    parser.add_argument("--profile", help="Write a cProfile dump of the run to this file")
+
+    parser.add_argument("--check_modules", action="store_true", help="Check required modules (installing missing ones with pip) before running")
+
+    args = parser.parse_args()
+
+    # Ensure required modules are installed, only when asked
+    if args.check_modules:
+        from module_check_install import check_required_modules
+        check_required_modules()
+
+    if args.timing:
+        enable()
+    if args.profile:
+        start_profile()
+    try:
+        predict(args)
+    finally:
+        if args.profile:
+            stop_profile(args.profile)
+        if args.timing:
+            report()
 
 if __name__ == "__main__":
     main()
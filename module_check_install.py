@@ -32,3 +32,6 @@ def check_required_modules():
     required_modules = ['skyfield', 'numpy', 'matplotlib', 'pytz']
     for module in required_modules:
         install_and_import(module)
+
+if __name__ == "__main__":
+    check_required_modules()
@@ -0,0 +1,227 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+prediction_server.py
+
+Long-running local HTTP/JSON prediction service. The ephemeris stays loaded, results are kept
+in a bounded LRU cache keyed by UTC minute, and batch requests are computed in one vectorized pass.
+
+#Example commands
+python prediction_server.py --port 8765
+curl "http://127.0.0.1:8765/predict?date=1859-09-01&time=11:55&zone=-5"
+curl -d '{"zone": -5, "timestamps": [{"date": "1859-09-01", "time": "11:55"}]}' http://127.0.0.1:8765/predict
+curl -d '{"zone": -5, "start": {"date": "1859-09-01", "time": "00:00"}, "end": {"date": "1859-09-02", "time": "00:00"}, "step_minutes": 60}' http://127.0.0.1:8765/predict
+curl http://127.0.0.1:8765/stats
+'''
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from astro_utils import (BODY_NAMES, get_all_angles_batch, get_ephemeris, get_planet_positions_batch, get_timescale,
+                         parse_date, set_ephemeris)
+from interference_predictor import predict_interference_batch
+
+MAX_BATCH = 100000  # Largest number of timestamps accepted in one request
+
+# Bounded LRU cache of results keyed by UTC minute, with hit/miss and latency counters
+class PredictionCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self.latencies = deque(maxlen=10000)  # Seconds, most recent requests
+
+    # Function to answer a list of UTC datetimes; misses are computed together in one batch
+    def predict(self, utc_datetimes):
+        keys = [utc_datetime.replace(second=0, microsecond=0) for utc_datetime in utc_datetimes]
+        with self.lock:
+            found = {key: self.results[key] for key in keys if key in self.results}
+            for key in found:
+                self.results.move_to_end(key)
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+
+        computed = compute_results(missing) if missing else {}
+        with self.lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            self.results.update(computed)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+        found.update(computed)
+        return [found[key] for key in keys]
+
+    def record_latency(self, seconds):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+
+    def stats(self):
+        with self.lock:
+            latencies_ms = np.array(self.latencies) * 1000
+            lookups = self.hits + self.misses
+            return {
+                'requests': self.requests,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'cache_size': len(self.results),
+                'cache_max_size': self.max_size,
+                'latency_ms': {
+                    f'p{percentile}': float(np.percentile(latencies_ms, percentile)) if len(latencies_ms) else None
+                    for percentile in (50, 90, 99)
+                },
+            }
+
+# Function to compute results for distinct UTC datetimes in one vectorized pass
+def compute_results(utc_datetimes):
+    ra, dec, distance = get_planet_positions_batch(utc_datetimes)
+    scores, probabilities = predict_interference_batch(get_all_angles_batch(ra, dec))
+    results = {}
+    for row, utc_datetime in enumerate(utc_datetimes):
+        results[utc_datetime] = {
+            'utc': utc_datetime.strftime('%Y-%m-%d %H:%M'),
+            'score': int(scores[row]),
+            'probability': float(probabilities[row]),
+            'positions': {planet: [ra[row, column], dec[row, column], distance[row, column]]
+                          for column, planet in enumerate(BODY_NAMES)},
+        }
+    return results
+
+# Function to turn a request into local (date, time) pairs and their UTC datetimes.
+# Accepts a single date/time, a list of timestamps, or a start/end range with step_minutes.
+def parse_request(request):
+    if not isinstance(request, dict):
+        raise ValueError(f"expected a JSON object, got {type(request).__name__}")
+    timezone_offset = timedelta(hours=float(request.get('zone', 0)))
+    if 'timestamps' in request:
+        local_datetimes = [parse_date(timestamp['date'], timestamp['time']) for timestamp in request['timestamps']]
+    elif 'start' in request:
+        start = parse_date(request['start']['date'], request['start']['time'])
+        end = parse_date(request['end']['date'], request['end']['time'])
+        step = timedelta(minutes=int(request.get('step_minutes', 1)))
+        if step <= timedelta(0):
+            raise ValueError("step_minutes must be positive")
+        count = int((end - start) / step) + 1
+        if count > MAX_BATCH:
+            raise ValueError(f"Range covers {count} timestamps; the limit is {MAX_BATCH}")
+        local_datetimes = [start + i * step for i in range(max(count, 0))]
+    else:
+        local_datetimes = [parse_date(request['date'], request['time'])]
+
+    if len(local_datetimes) > MAX_BATCH:
+        raise ValueError(f"Request has {len(local_datetimes)} timestamps; the limit is {MAX_BATCH}")
+    return local_datetimes, [local_datetime - timezone_offset for local_datetime in local_datetimes]
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    cache = None  # Set by main()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/stats':
+            self.send_json(200, self.cache.stats())
+        elif url.path == '/predict':
+            self.handle_predict({name: values[0] for name, values in parse_qs(url.query).items()})
+        else:
+            self.send_json(404, {'error': f'Unknown path {url.path}'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/predict':
+            self.send_json(404, {'error': f'Unknown path {url.path}'})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except ValueError as e:
+            self.send_json(400, {'error': f'Invalid JSON: {e}'})
+            return
+        self.handle_predict(request)
+
+    def handle_predict(self, request):
+        started = time.perf_counter()
+        try:
+            local_datetimes, utc_datetimes = parse_request(request)
+        except (AttributeError, KeyError, OverflowError, TypeError, ValueError) as e:  # Overflow: huge zone or step
+            self.send_json(400, {'error': f'Invalid request: {e}'})
+            return
+
+        # GET and POST both end up here, so a failed computation always gets a JSON answer and a latency sample
+        try:
+            predictions = self.cache.predict(utc_datetimes)
+        except ValueError as e:  # E.g. Skyfield's EphemerisRangeError for a date the kernel does not cover
+            status, payload = 400, {'error': f'Cannot predict: {e}'}
+        except Exception as e:
+            status, payload = 500, {'error': f'Prediction failed: {e}'}
+        else:
+            results = []
+            for local_datetime, result in zip(local_datetimes, predictions):
+                results.append(dict(result, date=local_datetime.strftime('%Y-%m-%d'), time=local_datetime.strftime('%H:%M')))
+            status, payload = 200, {'results': results}
+        self.cache.record_latency(time.perf_counter() - started)
+        self.send_json(status, payload)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the console quiet; use /stats for monitoring
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Serve interference predictions over HTTP/JSON with a warm ephemeris.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--cache_size", type=int, default=100000, help="Maximum number of cached UTC minutes (default: 100000)")
+    parser.add_argument("--ephemeris", help="JPL kernel to load, e.g. de421.bsp (default: de406.bsp or $NERAAS_EPHEMERIS)")
+
+    args = parser.parse_args()
+
+    if args.ephemeris:
+        set_ephemeris(args.ephemeris)
+
+    # Warm up the kernel and timescale before accepting requests
+    get_ephemeris()
+    get_timescale()
+
+    PredictionHandler.cache = PredictionCache(args.cache_size)
+    server = ThreadingHTTPServer((args.host, args.port), PredictionHandler)
+    print(f"Serving predictions on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
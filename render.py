@@ -0,0 +1,102 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+render.py
+
+Headless batch rendering: polar frames to PNG across a process pool, an MP4/GIF animation,
+and score/probability strip and heatmap plots, all from one batch computation.
+
+#Example commands
+python render.py --start_date 1859-01-01 --end_date 1859-12-31 --frames_dir frames
+python render.py --start_date 1859-01-01 --end_date 1859-12-31 --animation 1859.mp4 --fps 24
+python render.py --start_date 1859-01-01 --end_date 1859-12-31 --step_hours 1 --strip strip.png --heatmap heatmap.png
+'''
+
+import argparse
+from datetime import timedelta
+
+import matplotlib
+matplotlib.use('Agg')  # Headless; nothing is shown on screen
+
+from astro_utils import BODY_NAMES, get_all_angles_batch, get_planet_positions_batch, parse_date, set_ephemeris
+from interference_predictor import predict_interference_batch
+from visualization import plot_probability_heatmap, plot_score_strip, render_animation, render_frames
+
+# Function to compute the batch arrays for every step between two local dates (inclusive)
+def compute_frames(start_date, end_date, step_hours, zone):
+    start = parse_date(start_date, "00:00")
+    end = parse_date(end_date, "23:59")
+    step = timedelta(hours=step_hours)
+    local_datetimes = [start + i * step for i in range(int((end - start) / step) + 1)]
+    utc_datetimes = [local_datetime - timedelta(hours=zone) for local_datetime in local_datetimes]
+
+    ra, dec, distance = get_planet_positions_batch(utc_datetimes)
+    scores, probabilities = predict_interference_batch(get_all_angles_batch(ra, dec))
+    return {
+        'planets': BODY_NAMES,
+        'ra': ra,
+        'dec': dec,
+        'distance': distance,
+        'score': scores,
+        'probability': probabilities,
+        'date': [local_datetime.strftime('%Y-%m-%d') for local_datetime in local_datetimes],
+        'time': [local_datetime.strftime('%H:%M') for local_datetime in local_datetimes],
+    }
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Render planetary position frames, animations and score plots.")
+    parser.add_argument("--start_date", required=True, help="First date in the format YYYY-MM-DD (CE)")
+    parser.add_argument("--end_date", required=True, help="Last date in the format YYYY-MM-DD (CE)")
+    parser.add_argument("--step_hours", type=float, default=24, help="Hours between frames (default: 24)")
+    parser.add_argument("--zone", type=int, default=-5, help="Time zone offset from UTC (default: -5)")
+    parser.add_argument("--frames_dir", help="Write one PNG per frame into this directory")
+    parser.add_argument("--animation", help="Write an animation to this .mp4 (needs ffmpeg) or .gif file")
+    parser.add_argument("--fps", type=int, default=10, help="Animation frames per second (default: 10)")
+    parser.add_argument("--strip", help="Write a score/probability time-series strip to this image file")
+    parser.add_argument("--heatmap", help="Write a probability heatmap (one row per day) to this image file")
+    parser.add_argument("--workers", type=int, help="Worker processes for --frames_dir (default: CPU count)")
+    parser.add_argument("--dpi", type=int, default=100, help="Resolution of frames and animation (default: 100)")
+    parser.add_argument("--ephemeris", help="JPL kernel to load, e.g. de421.bsp (default: de406.bsp or $NERAAS_EPHEMERIS)")
+
+    args = parser.parse_args()
+
+    if args.ephemeris:
+        set_ephemeris(args.ephemeris)
+
+    try:
+        frames = compute_frames(args.start_date, args.end_date, args.step_hours, args.zone)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.frames_dir:
+        count = render_frames(frames, args.frames_dir, args.workers, args.dpi)
+        print(f"{count} frames written to {args.frames_dir}")
+    if args.animation:
+        render_animation(frames, args.animation, args.fps, args.dpi)
+        print(f"Animation written to {args.animation}")
+    if args.strip:
+        plot_score_strip(range(len(frames['score'])), frames['score'], frames['probability'], args.strip,
+                         xlabel=f"Step ({args.step_hours:g} h) from {args.start_date}")
+        print(f"Score strip written to {args.strip}")
+    if args.heatmap:
+        plot_probability_heatmap(frames['probability'], max(1, round(24 / args.step_hours)), args.heatmap,
+                                 row_label=f"Day from {args.start_date}", column_label=f"Step of the day ({args.step_hours:g} h)")
+        print(f"Heatmap written to {args.heatmap}")
+
+if __name__ == "__main__":
+    main()
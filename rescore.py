@@ -0,0 +1,157 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+rescore.py
+
+Re-scores stored positions with configurable rule sets, without evaluating the ephemeris again.
+A rule set is a JSON file of aspect bands, optionally with the probability scale and the pairs to
+score, compiled into the binned lookup of interference_predictor. The RA/Dec columns of a columnar
+directory are streamed in blocks. Angles are computed once per block and every rule set is applied
+to them, each writing Score.<name> and Probability.<name> derived columns.
+
+#Example rule file
+{"name": "wide", "probability_scale": 1.5, "pairs": ["mercury-venus", "earth-mars"],
+ "bands": [{"name": "conjunction", "low": 0, "high": 12, "weight": 10},
+           {"name": "square", "low": 85, "high": 95, "weight": 7}]}
+
+#Example commands
+python rescore.py --write_default default.json
+python rescore.py results.cols --rules wide.json strict.json
+'''
+
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from astro_utils import BODY_NAMES, get_all_angles_batch, get_pair_names
+from columnar_store import open_columns, positions, write_derived_columns
+from instrumentation import enable, report, stage
+from interference_predictor import ASPECT_BANDS, PROBABILITY_SCALE, compile_bands, score_angles
+
+BLOCK_ROWS = 1 << 18  # Rows per streamed block; about 100 MB of working arrays
+
+# Function to describe the built-in scoring rules as a rule set config
+def default_rule_set():
+    return {
+        'name': 'default',
+        'probability_scale': PROBABILITY_SCALE,
+        'bands': [{'name': name, 'exact': exact, 'low': low, 'high': high, 'weight': weight}
+                  for name, exact, low, high, weight in ASPECT_BANDS],
+    }
+
+# Function to load and compile a rule set JSON file.
+# Returns a dict with the 'name', the compiled 'rules', the 'pairs' column indices and the original 'config'.
+def load_rule_set(path):
+    with open(path) as rules_file:
+        config = json.load(rules_file)
+    name = config.get('name', os.path.splitext(os.path.basename(path))[0])
+    if not re.fullmatch(r'[A-Za-z0-9_-]+', name):
+        raise ValueError(f"{path}: rule set name {name!r} may only use letters, digits, '_' and '-'")
+    try:
+        bands = [(band.get('name', ''), band.get('exact'), float(band['low']), float(band['high']), band['weight'])
+                 for band in config['bands']]
+    except KeyError as e:
+        raise ValueError(f"{path}: every band needs 'low', 'high' and 'weight' ({e} missing)")
+
+    pair_names = get_pair_names(BODY_NAMES)
+    unknown = set(config.get('pairs', [])) - set(pair_names)
+    if unknown:
+        raise ValueError(f"{path}: unknown pairs {sorted(unknown)}; use names like {pair_names[0]}")
+    pairs = [pair_names.index(pair) for pair in config['pairs']] if 'pairs' in config else None
+
+    rules = compile_bands(bands, config.get('probability_scale', PROBABILITY_SCALE))
+    return {'name': name, 'rules': rules, 'pairs': pairs, 'config': config}
+
+# Function to pick the stored dtype of a rule set's scores: int16 when integer weights cannot overflow it
+def score_dtype(rule_set):
+    weights = rule_set['rules']['weights']
+    pairs = len(rule_set['pairs']) if rule_set['pairs'] is not None else len(get_pair_names(BODY_NAMES))
+    if np.issubdtype(weights.dtype, np.integer) and np.abs(weights).max() * pairs <= np.iinfo(np.int16).max:
+        return '<i2'
+    return '<f4'
+
+# Function to stream the stored positions in blocks and yield every rule set's scores per block
+def rescore_blocks(columns, rule_sets, block_rows=BLOCK_ROWS):
+    rows = len(columns['jd'])
+    for start in range(0, rows, block_rows):
+        with stage('read_positions'):
+            ra, dec = positions(columns, rows=slice(start, start + block_rows))
+        angles = get_all_angles_batch(ra, dec)
+        block = {}
+        with stage('scoring'):
+            for rule_set in rule_sets:
+                selected = angles if rule_set['pairs'] is None else angles[:, rule_set['pairs']]
+                scores, probabilities = score_angles(selected, rule_set['rules'])
+                block[f"Score.{rule_set['name']}"] = scores
+                block[f"Probability.{rule_set['name']}"] = probabilities
+        yield block
+
+# Function to rescore a columnar directory with several rule sets in one pass; returns the number of rows
+def rescore(path, rule_sets, block_rows=BLOCK_ROWS):
+    _, columns = open_columns(path)
+    dtypes, info = {}, {}
+    for rule_set in rule_sets:
+        dtypes[f"Score.{rule_set['name']}"] = score_dtype(rule_set)
+        dtypes[f"Probability.{rule_set['name']}"] = '<f4'
+        info[f"Score.{rule_set['name']}"] = {'rules': rule_set['config']}
+    return write_derived_columns(path, dtypes, rescore_blocks(columns, rule_sets, block_rows), info)
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored positions with configurable rule sets.")
+    parser.add_argument("path", nargs="?", help="Columnar directory written with --columnar_output")
+    parser.add_argument("--rules", nargs="+", default=[], help="Rule set JSON files; all are applied in one pass over the data")
+    parser.add_argument("--block_rows", type=int, default=BLOCK_ROWS, help=f"Rows per streamed block (default: {BLOCK_ROWS})")
+    parser.add_argument("--write_default", help="Write the built-in rules to this JSON file as a starting point and exit")
+    parser.add_argument("--timing", action="store_true", help="Print per-stage wall/CPU time and call counts at the end")
+
+    args = parser.parse_args()
+
+    if args.write_default:
+        with open(args.write_default, 'w') as rules_file:
+            json.dump(default_rule_set(), rules_file, indent=2)
+        print(f"Default rules written to {args.write_default}")
+        return
+    if not args.path or not args.rules:
+        parser.error("give a columnar directory and at least one --rules file")
+
+    rule_sets = [load_rule_set(path) for path in args.rules]
+    names = [rule_set['name'] for rule_set in rule_sets]
+    if len(set(names)) != len(names):
+        parser.error(f"rule set names must be unique, got {names}")
+
+    if args.timing:
+        enable()
+    started = time.perf_counter()
+    rows = rescore(args.path, rule_sets, args.block_rows)
+    elapsed = time.perf_counter() - started
+    print(f"Rescored {rows} rows with {len(rule_sets)} rule sets in {elapsed:.2f} s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+    _, columns = open_columns(args.path)
+    for name in names:
+        probabilities = columns[f"Probability.{name}"]
+        print(f"{name}: max probability {probabilities.max() if rows else 0:.1f}%, "
+              f"mean score {columns[f'Score.{name}'].mean() if rows else 0:.2f}")
+    if args.timing:
+        report()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+result_store.py
+
+SQLite store of results keyed by local Julian date, for time-range and threshold queries
+without scanning a CSV. The key is numeric, so BCE and CE rows sort and compare correctly;
+the table is clustered on it, so a range lookup reads only the rows in the range.
+
+#Example commands
+python generate_data.py --start_year 1850 --end_year 1869 --interval hours --db_output results.db
+python result_store.py results.db --start 1859-03-01 --end 1859-03-31 --max probability
+python result_store.py results.db --start 1000-01-01 --end 1200-12-31 --min_score 31 --limit 20
+python result_store.py results.db --start "0500-01-01 BCE" --end 0500-12-31 --count --min_probability 50
+'''
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+from astro_utils import BODY_NAMES
+from time_grid import astronomical_year, calendar_to_jdn
+
+COLUMNS = (['jd', 'Date', 'Time', 'Score', 'Probability']
+           + [f'{body}_RA' for body in BODY_NAMES] + [f'{body}_Dec' for body in BODY_NAMES])
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS results (
+    jd REAL PRIMARY KEY,
+    Date TEXT NOT NULL,
+    Time TEXT NOT NULL,
+    Score INTEGER NOT NULL,
+    Probability REAL NOT NULL,
+    {", ".join(f"{column} REAL" for column in COLUMNS[5:])}
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_score ON results (Score, jd);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+'''
+
+# Function to compute the local Julian date key from Julian Day Numbers and minutes of the local day
+def local_jd(jdn, minute):
+    return jdn - 0.5 + minute / 1440
+
+# Function to turn local Julian dates back into exact integer minute keys (JDN * 1440 + minute of the day)
+def jd_to_minutes(jd):
+    return np.round((np.asarray(jd, dtype=np.float64) + 0.5) * 1440).astype(np.int64)
+
+# Function to convert a Date/Time label ("YYYY-MM-DD", "YYYY-MM-DD BCE" or "-YYYY-MM-DD"; "HH:MM") to its key
+def label_to_jd(date_str, time_str="00:00", calendar="gregorian"):
+    bce = date_str.endswith(" BCE") or date_str.startswith("-")
+    year, month, day = date_str.replace(" BCE", "").lstrip("-").split("-")
+    year = -int(year) if bce else int(year)
+    hour, minute = time_str.split(":")
+    jdn = calendar_to_jdn(astronomical_year(year), int(month), int(day), calendar)
+    return float(local_jd(jdn, int(hour) * 60 + int(minute)))
+
+# SQLite-backed result table, written in bulk transactions and queried by local Julian date
+class ResultStore:
+    def __init__(self, path, calendar=None, zone=None):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.meta = dict(self.connection.execute("SELECT name, value FROM meta"))
+        if calendar is not None:
+            self.check_meta('calendar', calendar)
+        if zone is not None:
+            self.check_meta('zone', str(zone))
+
+    # Keys are local dates in one calendar and zone, so refuse to mix rows written with different ones
+    def check_meta(self, name, value):
+        if name not in self.meta:
+            with self.connection:
+                self.connection.execute("INSERT INTO meta (name, value) VALUES (?, ?)", (name, value))
+            self.meta[name] = value
+        elif self.meta[name] != value:
+            raise ValueError(f"{self.path} holds results for {name} {self.meta[name]}, not {value}")
+
+    # Function to write rows (tuples in COLUMNS order) in one transaction; rewriting a key replaces its row
+    def insert(self, rows):
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO results VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+    # Function to build the WHERE clause shared by the queries
+    @staticmethod
+    def where(start_jd, end_jd, min_score=None, min_probability=None):
+        clause, parameters = "jd BETWEEN ? AND ?", [start_jd, end_jd]
+        if min_score is not None:
+            clause += " AND Score >= ?"
+            parameters.append(min_score)
+        if min_probability is not None:
+            clause += " AND Probability >= ?"
+            parameters.append(min_probability)
+        return clause, parameters
+
+    # Function to return the rows between two keys (inclusive) in time order, optionally above thresholds
+    def query(self, start_jd, end_jd, min_score=None, min_probability=None, limit=None):
+        clause, parameters = self.where(start_jd, end_jd, min_score, min_probability)
+        sql = f"SELECT * FROM results WHERE {clause} ORDER BY jd"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return self.connection.execute(sql, parameters).fetchall()
+
+    # Function to return the earliest row with the highest Score or Probability between two keys, or None
+    def max_row(self, start_jd, end_jd, column="Probability", min_score=None, min_probability=None):
+        if column not in ("Score", "Probability"):
+            raise ValueError(f"Unknown column {column}; choose Score or Probability")
+        clause, parameters = self.where(start_jd, end_jd, min_score, min_probability)
+        return self.connection.execute(
+            f"SELECT * FROM results WHERE {clause} ORDER BY {column} DESC, jd LIMIT 1", parameters).fetchone()
+
+    # Function to count the rows between two keys, optionally above thresholds
+    def count(self, start_jd, end_jd, min_score=None, min_probability=None):
+        clause, parameters = self.where(start_jd, end_jd, min_score, min_probability)
+        return self.connection.execute(f"SELECT COUNT(*) FROM results WHERE {clause}", parameters).fetchone()[0]
+
+    # Function to return the integer minute keys (see jd_to_minutes) of the rows between two keys
+    def minute_keys(self, start_jd, end_jd):
+        rows = self.connection.execute("SELECT jd FROM results WHERE jd BETWEEN ? AND ? ORDER BY jd", (start_jd, end_jd))
+        return jd_to_minutes(np.fromiter((jd for jd, in rows), dtype=np.float64))
+
+    # Function to summarize the minute keys first_key + k * step up to last_key as (first, last, count) rows,
+    # one per block of block_steps steps, in time order. SQLite does the scan, so only the block rows come back.
+    def minute_blocks(self, first_key, last_key, step, block_steps):
+        first_key, last_key = int(first_key), int(last_key)
+        rows = self.connection.execute(
+            "SELECT MIN(key), MAX(key), COUNT(*) FROM"
+            " (SELECT CAST(ROUND((jd + 0.5) * 1440) AS INTEGER) - ? AS key FROM results WHERE jd BETWEEN ? AND ?)"
+            " WHERE key BETWEEN 0 AND ? AND key % ? = 0 GROUP BY key / ? ORDER BY 1",
+            (first_key, (first_key - 1) / 1440 - 0.5, (last_key + 1) / 1440 - 0.5, last_key - first_key, step,
+             step * block_steps))
+        blocks = np.array(rows.fetchall(), dtype=np.int64).reshape(-1, 3)
+        blocks[:, :2] += first_key
+        return blocks
+
+    def close(self):
+        self.connection.close()
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Query a result store by time range and thresholds.")
+    parser.add_argument("db", help="SQLite file written with --db_output")
+    parser.add_argument("--start", required=True, help='First local date: YYYY-MM-DD, "YYYY-MM-DD BCE" or -YYYY-MM-DD')
+    parser.add_argument("--end", required=True, help="Last local date, same formats (inclusive)")
+    parser.add_argument("--start_time", default="00:00", help="Local time on the first date (default: 00:00)")
+    parser.add_argument("--end_time", default="23:59", help="Local time on the last date (default: 23:59)")
+    parser.add_argument("--min_score", type=int, help="Only rows with Score >= this")
+    parser.add_argument("--min_probability", type=float, help="Only rows with Probability >= this")
+    parser.add_argument("--max", choices=["score", "probability"], help="Print only the first row with the highest score or probability")
+    parser.add_argument("--count", action="store_true", help="Print only the number of matching rows")
+    parser.add_argument("--limit", type=int, help="Print at most this many rows")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"{args.db} does not exist")
+    store = ResultStore(args.db)
+    calendar = store.meta.get('calendar', 'gregorian')
+    start_jd = label_to_jd(args.start, args.start_time, calendar)
+    end_jd = label_to_jd(args.end, args.end_time, calendar)
+
+    try:
+        if args.count:
+            print(store.count(start_jd, end_jd, args.min_score, args.min_probability))
+            return
+        if args.max:
+            row = store.max_row(start_jd, end_jd, args.max.capitalize(), args.min_score, args.min_probability)
+            rows = [row] if row else []
+        else:
+            rows = store.query(start_jd, end_jd, args.min_score, args.min_probability, args.limit)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
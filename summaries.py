@@ -0,0 +1,248 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+summaries.py
+
+Streaming summaries of generated predictions, updated chunk by chunk as rows are produced:
+per local day and month, the row count, Score mean/standard deviation/min/max, Probability
+mean/max, rows and windows (runs of consecutive rows) at or above a high-probability threshold,
+and per month a Probability histogram, exact Score counts and per-pair aspect counts.
+Aggregators built on separate shards merge in time order. Scores are integers, so their sums
+and sums of squares are exact in any order, and the mean and standard deviation are derived
+from them only when the tables are written. Probabilities are Scores times 1.5, so their sums
+are exact too, and parallel runs give the same tables as sequential ones, bit for bit.
+
+#Example command
+python generate_data.py --start_year 1850 --end_year 1859 --interval minutes --summary_output summary
+'''
+
+import csv
+
+import numpy as np
+
+from astro_utils import BODY_NAMES, get_pair_names
+from interference_predictor import ASPECT_BANDS
+from time_grid import grid_labels, historical_year, jdn_to_calendar
+
+# Per-bucket statistics, in this order
+STAT_FIELDS = ('rows', 'score_sum', 'score_square_sum', 'score_min', 'score_max', 'probability_sum', 'probability_max',
+               'high_rows', 'high_windows')
+HISTOGRAM_BINS = 10  # Probability histogram bins of 10 points; 100 falls in the last one
+
+# Function to compute per-segment statistics of a chunk sorted by bucket key.
+# Returns the unique keys, the segment start offsets and a (segments, len(STAT_FIELDS)) array.
+def segment_stats(keys, scores, probabilities, high, starts):
+    offsets = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    counts = np.diff(np.append(offsets, len(keys)))
+    stats = np.column_stack([
+        counts,
+        np.add.reduceat(scores, offsets),
+        np.add.reduceat(scores ** 2, offsets),
+        np.minimum.reduceat(scores, offsets),
+        np.maximum.reduceat(scores, offsets),
+        np.add.reduceat(probabilities, offsets),
+        np.maximum.reduceat(probabilities, offsets),
+        np.add.reduceat(high, offsets),
+        np.add.reduceat(starts, offsets),
+    ])
+    return keys[offsets], offsets, stats
+
+# Function to merge two statistics rows (lists in STAT_FIELDS order) into the first
+def merge_stats(into, other):
+    into[0] += other[0]
+    into[1] += other[1]
+    into[2] += other[2]
+    into[3] = min(into[3], other[3])
+    into[4] = max(into[4], other[4])
+    into[5] += other[5]
+    into[6] = max(into[6], other[6])
+    into[7] += other[7]
+    into[8] += other[8]
+
+# Function to format one statistics row for the summary tables; the Score variance is computed in integers
+def summary_row(stats):
+    rows, score_sum, score_square_sum, score_min, score_max, probability_sum, probability_max, high_rows, high_windows = stats
+    rows, score_sum, score_square_sum = int(rows), int(score_sum), int(score_square_sum)
+    score_std = (rows * score_square_sum - score_sum ** 2) ** 0.5 / rows
+    return [rows, round(score_sum / rows, 3), round(score_std, 3), int(score_min), int(score_max),
+            round(probability_sum / rows, 3), probability_max, int(high_rows), int(high_windows)]
+
+# Function to add count arrays into a table keyed by month
+def add_counts(table, key, counts):
+    table[key] = table[key] + counts if key in table else np.array(counts)
+
+# Streaming day/month summaries; update() takes chunks in time order, merge() appends a later aggregator
+class SummaryAggregator:
+    def __init__(self, calendar="gregorian", threshold=50.0):
+        self.calendar = calendar
+        self.threshold = threshold
+        self.daily = {}          # Local JDN -> stats
+        self.monthly = {}        # year * 12 + month - 1 (astronomical year) -> stats
+        self.histograms = {}     # Month key -> Probability histogram counts
+        self.score_counts = {}   # Month key -> {score: rows}
+        self.aspects = {}        # Month key -> (pairs, bands) row counts
+        self.first = None        # (high, day key, month key) of the first row seen
+        self.last_high = False   # Whether the last row seen was at or above the threshold
+
+    # Function to merge statistics rows into daily or monthly buckets
+    @staticmethod
+    def add_stats(buckets, keys, rows):
+        for key, row in zip(keys, rows):
+            if key in buckets:
+                merge_stats(buckets[key], row)
+            else:
+                buckets[key] = list(row)
+
+    # Function to add one chunk: grid holds the local 'jdn', chunk the 'score' and 'probability' columns
+    # and, for aspect counts, the 'aspects' band indices of get_aspect_index (-1 where no band applies)
+    def update(self, grid, chunk):
+        jdn = np.asarray(grid['jdn'])
+        if len(jdn) == 0:
+            return
+        scores = np.asarray(chunk['score'], dtype=np.float64)
+        probabilities = np.asarray(chunk['probability'], dtype=np.float64)
+        high = probabilities >= self.threshold
+        starts = high & ~np.concatenate([[self.last_high], high[:-1]])
+        year, month, _ = jdn_to_calendar(jdn, self.calendar)
+        months = year * 12 + month - 1
+        if self.first is None:
+            self.first = (bool(high[0]), int(jdn[0]), int(months[0]))
+        self.last_high = bool(high[-1])
+
+        days, _, day_stats = segment_stats(jdn, scores, probabilities, high, starts)
+        self.add_stats(self.daily, days.tolist(), day_stats.tolist())
+        unique_months, offsets, month_stats = segment_stats(months, scores, probabilities, high, starts)
+        self.add_stats(self.monthly, unique_months.tolist(), month_stats.tolist())
+
+        # Per-month counts, binned in one pass with the month's segment number as the leading index
+        segments = np.repeat(np.arange(len(offsets)), np.diff(np.append(offsets, len(months))))
+        bins = np.minimum((probabilities // (100 / HISTOGRAM_BINS)).astype(np.intp), HISTOGRAM_BINS - 1)
+        histograms = np.bincount(segments * HISTOGRAM_BINS + bins, minlength=len(offsets) * HISTOGRAM_BINS)
+        histograms = histograms.reshape(len(offsets), HISTOGRAM_BINS)
+        if 'aspects' in chunk:
+            pairs, bands = chunk['aspects'].shape[1], len(ASPECT_BANDS) + 1
+            index = (segments[:, None] * pairs + np.arange(pairs)) * bands + chunk['aspects'] + 1
+            aspects = np.bincount(index.ravel(), minlength=len(offsets) * pairs * bands)
+            aspects = aspects.reshape(len(offsets), pairs, bands)[:, :, 1:]  # Drop the "no band" counts
+        for segment, key in enumerate(unique_months.tolist()):
+            add_counts(self.histograms, key, histograms[segment])
+            if 'aspects' in chunk:
+                add_counts(self.aspects, key, aspects[segment])
+            values, counts = np.unique(scores[segments == segment].astype(np.int64), return_counts=True)
+            score_counts = self.score_counts.setdefault(key, {})
+            for score, rows in zip(values.tolist(), counts.tolist()):
+                score_counts[score] = score_counts.get(score, 0) + rows
+
+    # Function to append the summaries of the rows that directly follow this aggregator's rows
+    def merge(self, other):
+        if other.first is None:
+            return
+        self.add_stats(self.daily, other.daily, other.daily.values())
+        self.add_stats(self.monthly, other.monthly, other.monthly.values())
+        for key, histogram in other.histograms.items():
+            add_counts(self.histograms, key, histogram)
+        for key, aspects in other.aspects.items():
+            add_counts(self.aspects, key, aspects)
+        for key, other_counts in other.score_counts.items():
+            score_counts = self.score_counts.setdefault(key, {})
+            for score, rows in other_counts.items():
+                score_counts[score] = score_counts.get(score, 0) + rows
+
+        # A window running across the boundary was counted as starting in both parts
+        first_high, first_day, first_month = other.first
+        if self.last_high and first_high:
+            self.daily[first_day][8] -= 1
+            self.monthly[first_month][8] -= 1
+        if self.first is None:
+            self.first = other.first
+        self.last_high = other.last_high
+
+    # Function to export the state as JSON-compatible data, e.g. for the per-shard checkpoint files
+    def to_state(self):
+        return {
+            'calendar': self.calendar, 'threshold': self.threshold, 'first': self.first, 'last_high': self.last_high,
+            'daily': list(self.daily.items()), 'monthly': list(self.monthly.items()),
+            'histograms': [(key, counts.tolist()) for key, counts in self.histograms.items()],
+            'aspects': [(key, counts.tolist()) for key, counts in self.aspects.items()],
+            'score_counts': [(key, list(counts.items())) for key, counts in self.score_counts.items()],
+        }
+
+    # Function to rebuild an aggregator from to_state() data
+    @classmethod
+    def from_state(cls, state):
+        summary = cls(state['calendar'], state['threshold'])
+        summary.first = tuple(state['first']) if state['first'] else None
+        summary.last_high = state['last_high']
+        summary.daily = dict(state['daily'])
+        summary.monthly = dict(state['monthly'])
+        summary.histograms = {key: np.array(counts) for key, counts in state['histograms']}
+        summary.aspects = {key: np.array(counts) for key, counts in state['aspects']}
+        summary.score_counts = {key: dict(counts) for key, counts in state['score_counts']}
+        return summary
+
+    # Function to label a month key as "YYYY-MM" or "YYYY-MM BCE"
+    @staticmethod
+    def month_label(key):
+        year = int(historical_year(key // 12))
+        return f"{abs(year):04d}-{key % 12 + 1:02d}" + (" BCE" if year < 0 else "")
+
+    # Function to write the summary tables as <prefix>_daily.csv, _monthly.csv, _scores.csv and _aspects.csv.
+    # The daily table includes a trailing mean Probability over the last rolling_days days.
+    def write(self, prefix, rolling_days=7):
+        days = np.array(sorted(self.daily), dtype=np.int64)
+        daily = np.array([self.daily[day] for day in days.tolist()]).reshape(-1, len(STAT_FIELDS))
+        rows_sum = np.concatenate([[0], np.cumsum(daily[:, 0])])
+        probability_sum = np.concatenate([[0], np.cumsum(daily[:, 5])])
+        window_start = np.searchsorted(days, days - rolling_days + 1)
+        window_end = np.arange(1, len(days) + 1)
+        rolling = ((probability_sum[window_end] - probability_sum[window_start])
+                   / (rows_sum[window_end] - rows_sum[window_start]))
+
+        dates, _ = grid_labels({'jdn': days, 'minute': np.zeros_like(days)}, self.calendar)
+        with open(f"{prefix}_daily.csv", 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['Date', 'Rows', 'Score_Mean', 'Score_Std', 'Score_Min', 'Score_Max', 'Probability_Mean',
+                             'Probability_Max', 'High_Rows', 'High_Windows', f'Probability_Rolling_Mean_{rolling_days}d'])
+            for date, stats, rolling_mean in zip(dates, daily.tolist(), rolling.tolist()):
+                writer.writerow([date] + summary_row(stats) + [round(rolling_mean, 3)])
+
+        months = sorted(self.monthly)
+        with open(f"{prefix}_monthly.csv", 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            width = 100 // HISTOGRAM_BINS
+            writer.writerow(['Month', 'Rows', 'Score_Mean', 'Score_Std', 'Score_Min', 'Score_Max', 'Probability_Mean',
+                             'Probability_Max', 'High_Rows', 'High_Windows']
+                            + [f'Probability_{low}_{low + width}' for low in range(0, 100, width)])
+            for key in months:
+                writer.writerow([self.month_label(key)] + summary_row(self.monthly[key])
+                                + self.histograms[key].tolist())
+
+        with open(f"{prefix}_scores.csv", 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['Month', 'Score', 'Rows'])
+            for key in months:
+                for score, rows in sorted(self.score_counts[key].items()):
+                    writer.writerow([self.month_label(key), score, rows])
+
+        if self.aspects:
+            pair_names = get_pair_names(BODY_NAMES)
+            with open(f"{prefix}_aspects.csv", 'w', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(['Month', 'Pair'] + [name for name, *_ in ASPECT_BANDS])
+                for key in months:
+                    for pair, counts in zip(pair_names, self.aspects[key].tolist()):
+                        writer.writerow([self.month_label(key), pair] + counts)
@@ -0,0 +1,220 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+threshold_scan.py
+
+Finds every window where Probability >= a threshold on the generate_data.py time grid,
+without evaluating every timestamp. The grid is sampled coarsely (daily by default). Between
+two samples, no pair's separation can move faster than the sum of the bodies' MAX_ANGULAR_RATES,
+which bounds every pair's angle, hence its band weight and the total score, over the interval.
+Intervals whose score bounds are wholly above or below the threshold are settled; the others are
+resampled more finely, down to single grid steps. Windows are the first and last grid timestamps
+at or above the threshold, the same as sampling the whole grid with generate_data.py.
+
+#Example commands
+python threshold_scan.py --start_year 1850 --end_year 1859 --min_probability 60 --csv_output windows.csv
+python threshold_scan.py --start_year -500 --end_year 500 --interval hours --min_probability 75 --csv_output windows.csv --fast --timing
+'''
+
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from astro_utils import BODY_NAMES, MAX_ANGULAR_RATES, get_all_angles_batch, get_planet_positions_batch, get_timescale, set_ephemeris
+from fast_positions import get_model, get_planet_positions_fast
+from instrumentation import enable, report, stage
+from interference_predictor import DEFAULT_RULES, score_angles
+from rescore import load_rule_set
+from time_grid import CALENDARS, INTERVAL_MINUTES, astronomical_year, grid_labels, grid_points, grid_size, grid_to_time
+
+ANGLE_MARGIN = 1e-6  # Degrees added to the angle bounds for rounding in the computed separations
+
+# Function to tabulate the lowest and highest weight over every run of breakpoint segments i..j
+def weight_ranges(rules):
+    weights = rules['weights']
+    lowest = np.array([[weights[i:j + 1].min() if j >= i else 0 for j in range(len(weights))] for i in range(len(weights))])
+    highest = np.array([[weights[i:j + 1].max() if j >= i else 0 for j in range(len(weights))] for i in range(len(weights))])
+    return lowest, highest
+
+# Function to tell whether probabilities are at or above the threshold; monotonic in the score
+def is_high(scores, rules, threshold):
+    return np.clip(scores * rules['probability_scale'], 0, 100) >= threshold
+
+# Grid scanner for one rule set and threshold, evaluating only the timestamps the bounds leave open
+class ThresholdScanner:
+    def __init__(self, start_year, interval, threshold, zone=-5, calendar="gregorian", rules=DEFAULT_RULES,
+                 pairs=None, fast_range=None, refine=16, chunk_size=10000):
+        if interval not in INTERVAL_MINUTES:
+            raise ValueError(f"Scans need a uniform interval; choose one of {list(INTERVAL_MINUTES)}")
+        self.start_year, self.interval, self.threshold = start_year, interval, threshold
+        self.zone, self.calendar, self.rules, self.pairs = zone, calendar, rules, pairs
+        self.fast_range, self.refine, self.chunk_size = fast_range, max(refine, 2), chunk_size
+        self.step_days = INTERVAL_MINUTES[interval] / 1440
+        self.lowest, self.highest = weight_ranges(rules)
+        rows, columns = np.triu_indices(len(BODY_NAMES), k=1)
+        rates = np.array([MAX_ANGULAR_RATES[BODY_NAMES[i]] + MAX_ANGULAR_RATES[BODY_NAMES[j]] for i, j in zip(rows, columns)])
+        self.rates = rates if pairs is None else rates[pairs]
+        self.evaluated = 0
+
+    # Function to compute the pair angles and high flags of grid steps, chunk_size at a time
+    def evaluate(self, steps):
+        angles, high = [], []
+        for first in range(0, len(steps), self.chunk_size):
+            grid = grid_points(self.start_year, self.interval, steps[first:first + self.chunk_size], self.calendar)
+            t = grid_to_time(get_timescale(), grid, self.zone)
+            if self.fast_range:
+                ra, dec, _ = get_planet_positions_fast(get_model(*self.fast_range), t)
+            else:
+                ra, dec, _ = get_planet_positions_batch(t)
+            chunk_angles = get_all_angles_batch(ra, dec)
+            if self.pairs is not None:
+                chunk_angles = chunk_angles[:, self.pairs]
+            with stage('scoring'):
+                _, probabilities = score_angles(chunk_angles, self.rules)
+            angles.append(chunk_angles)
+            high.append(probabilities >= self.threshold)
+        self.evaluated += len(steps)
+        return np.concatenate(angles), np.concatenate(high)
+
+    # Function to bound the score between neighbouring samples a < b from their angles.
+    # A separation moving at most rate deg/day is within (angle_a + angle_b +- rate * days) / 2 between them.
+    # Returns True where the whole interval may not be on one side of the threshold.
+    def unsettled(self, a, b, angles_a, angles_b):
+        half_width = self.rates * ((b - a) * self.step_days / 2)[:, None] + ANGLE_MARGIN
+        middle = (angles_a + angles_b) / 2
+        edges = self.rules['edges']
+        first = np.searchsorted(edges, np.clip(middle - half_width, 0, 180), side='right')
+        last = np.searchsorted(edges, np.clip(middle + half_width, 0, 180), side='right')
+        low_high = is_high(self.lowest[first, last].sum(axis=1), self.rules, self.threshold)
+        high_high = is_high(self.highest[first, last].sum(axis=1), self.rules, self.threshold)
+        return low_high != high_high
+
+    # Function to scan grid steps first..last (inclusive) starting from samples stride steps apart.
+    # Returns the sorted evaluated steps and their high flags; between two consecutive evaluated
+    # steps every grid timestamp has the same flag as both of them.
+    def scan_span(self, first, last, stride):
+        steps = np.unique(np.append(np.arange(first, last, stride, dtype=np.int64), last))
+        angles, high = self.evaluate(steps)
+        found_steps, found_high = [steps], [high]
+        a, b = steps[:-1], steps[1:]
+        angles_a, angles_b = angles[:-1], angles[1:]
+        while len(a):
+            with stage('bounds'):
+                open_interval = (b - a > 1) & self.unsettled(a, b, angles_a, angles_b)
+            if not open_interval.any():
+                break
+            a, b, angles_a, angles_b = a[open_interval], b[open_interval], angles_a[open_interval], angles_b[open_interval]
+
+            # Sample the open intervals refine times more finely
+            spacing = np.maximum((b - a) // self.refine, 1)
+            counts = (b - a - 1) // spacing
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+            new_steps = np.repeat(a, counts) + offsets * np.repeat(spacing, counts)
+            new_angles, new_high = self.evaluate(new_steps)
+            found_steps.append(new_steps)
+            found_high.append(new_high)
+
+            # The next level's intervals are the neighbouring samples inside each open interval
+            points, index = np.unique(np.concatenate([a, new_steps, b]), return_index=True)
+            point_angles = np.concatenate([angles_a, new_angles, angles_b])[index]
+            owner = np.searchsorted(b, points[:-1], side='right')
+            inside = (owner < len(b)) & (a[np.minimum(owner, len(a) - 1)] <= points[:-1])
+            a, b = points[:-1][inside], points[1:][inside]
+            angles_a, angles_b = point_angles[:-1][inside], point_angles[1:][inside]
+
+        steps, index = np.unique(np.concatenate(found_steps), return_index=True)
+        return steps, np.concatenate(found_high)[index]
+
+    # Function to find the windows between grid steps first and last (inclusive).
+    # Returns a list of [start step, end step] pairs, both at or above the threshold.
+    def windows(self, first, last, coarse_steps):
+        coarse_steps = max(coarse_steps, 1)
+        span = coarse_steps * self.chunk_size
+        windows, last_high = [], False
+        for span_first in range(first, last + 1, span):
+            span_last = min(span_first + span, last)
+            steps, high = self.scan_span(span_first, span_last, coarse_steps)
+            if span_last < last:
+                steps, high = steps[:-1], high[:-1]  # The next span starts with this step
+            starts = steps[high & ~np.concatenate([[last_high], high[:-1]])].tolist()
+            ends = steps[high & ~np.concatenate([high[1:], [False]])].tolist()
+            if last_high and len(high) and high[0]:
+                windows[-1][1] = ends.pop(0)  # The open window continues into this span
+            windows.extend([start, end] for start, end in zip(starts, ends))
+            if len(high):
+                last_high = bool(high[-1])
+        return windows
+
+# Main function
+def main():
+    parser = argparse.ArgumentParser(description="Find the windows where Probability >= a threshold with an adaptive scan.")
+    parser.add_argument("--start_year", type=int, required=True, help="Start year (e.g., -1000 for 1000 BCE)")
+    parser.add_argument("--end_year", type=int, required=True, help="End year (e.g., 2023)")
+    parser.add_argument("--interval", choices=list(INTERVAL_MINUTES), default="minutes", help="Grid interval the windows are exact to (default: minutes)")
+    parser.add_argument("--min_probability", type=float, required=True, help="Report windows with Probability >= this")
+    parser.add_argument("--csv_output", required=True, help="CSV output file name")
+    parser.add_argument("--coarse_minutes", type=int, default=1440, help="Spacing of the first samples in minutes (default: 1440, daily)")
+    parser.add_argument("--refine", type=int, default=16, help="Factor by which open intervals are resampled at each level (default: 16)")
+    parser.add_argument("--rules", help="Rule set JSON file to score with instead of the built-in rules (see rescore.py)")
+    parser.add_argument("--zone", type=int, default=-5, help="Time zone offset from UTC of the grid's local times (default: -5)")
+    parser.add_argument("--calendar", choices=CALENDARS, default="gregorian", help="Proleptic calendar of the grid's dates (default: gregorian)")
+    parser.add_argument("--chunk_size", type=int, default=10000, help="Number of timestamps computed per batch (default: 10000)")
+    parser.add_argument("--ephemeris", help="JPL kernel to load, e.g. de421.bsp (default: de406.bsp or $NERAAS_EPHEMERIS)")
+    parser.add_argument("--fast", action="store_true", help="Use the cached Chebyshev position model instead of exact Skyfield evaluation")
+    parser.add_argument("--timing", action="store_true", help="Print per-stage wall/CPU time and call counts at the end")
+
+    args = parser.parse_args()
+    if 0 in (args.start_year, args.end_year):
+        parser.error("there is no year 0; use -1 for 1 BCE")
+
+    if args.ephemeris:
+        set_ephemeris(args.ephemeris)
+    if args.timing:
+        enable()
+    rules, pairs = DEFAULT_RULES, None
+    if args.rules:
+        rule_set = load_rule_set(args.rules)
+        rules, pairs = rule_set['rules'], rule_set['pairs']
+    fast_range = None
+    if args.fast:
+        fast_range = (int(astronomical_year(args.start_year)), int(astronomical_year(args.end_year)))
+        print(f"Fast position model max angular error: {get_model(*fast_range)['max_error_deg']:.2e}°")
+
+    scanner = ThresholdScanner(args.start_year, args.interval, args.min_probability, args.zone, args.calendar,
+                               rules, pairs, fast_range, args.refine, args.chunk_size)
+    total = grid_size(args.start_year, args.end_year, args.interval, args.calendar)
+    started = time.perf_counter()
+    windows = scanner.windows(0, total - 1, args.coarse_minutes // INTERVAL_MINUTES[args.interval]) if total else []
+    elapsed = time.perf_counter() - started
+
+    steps = np.array(windows, dtype=np.int64).reshape(-1, 2)
+    start_dates, start_times = grid_labels(grid_points(args.start_year, args.interval, steps[:, 0], args.calendar), args.calendar)
+    end_dates, end_times = grid_labels(grid_points(args.start_year, args.interval, steps[:, 1], args.calendar), args.calendar)
+    with open(args.csv_output, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['Start_Date', 'Start_Time', 'End_Date', 'End_Time', 'Rows'])
+        for row, (start, end) in enumerate(steps.tolist()):
+            writer.writerow([start_dates[row], start_times[row], end_dates[row], end_times[row], end - start + 1])
+    print(f"{len(windows)} windows saved to {args.csv_output}; evaluated {scanner.evaluated} of {total} timestamps "
+          f"({total / max(scanner.evaluated, 1):.0f}x fewer) in {elapsed:.2f} s")
+    if args.timing:
+        report()
+
+if __name__ == "__main__":
+    main()
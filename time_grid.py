@@ -0,0 +1,115 @@
+'''
+Planetary Magnetic Interference Prediction System - A brief description of what the program does.
+Copyright (C) 2024 William Blair
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+time_grid.py
+
+Calendar-correct time grids built as NumPy arrays of Julian Day Numbers and minutes of the day.
+Minutes, hours and days step with arange; months, seasons and years step the calendar exactly,
+in the proleptic Gregorian or Julian calendar. Years follow the command-line convention:
+-1000 means 1000 BCE and there is no year 0.
+'''
+
+import numpy as np
+
+from astro_utils import format_date
+
+INTERVAL_MINUTES = {"minutes": 1, "hours": 60, "days": 1440}
+INTERVAL_MONTHS = {"months": 1, "seasons": 3, "years": 12}
+CALENDARS = ("gregorian", "julian")
+
+# Functions to convert between historical years (1 BCE = -1) and astronomical years (1 BCE = 0)
+def astronomical_year(year):
+    if np.any(np.asarray(year) == 0):
+        raise ValueError("There is no year 0 in historical years; use -1 for 1 BCE")
+    return np.where(np.asarray(year) < 0, np.asarray(year) + 1, year)
+
+def historical_year(year):
+    return np.where(np.asarray(year) <= 0, np.asarray(year) - 1, year)
+
+# Function to convert calendar dates (astronomical years) to Julian Day Numbers, vectorized
+def calendar_to_jdn(year, month, day, calendar="gregorian"):
+    year, month, day = np.asarray(year), np.asarray(month), np.asarray(day)
+    a = (14 - month) // 12
+    y = year + 4800 - a
+    m = month + 12 * a - 3
+    jdn = day + (153 * m + 2) // 5 + 365 * y + y // 4
+    if calendar == "julian":
+        return jdn - 32083
+    return jdn - y // 100 + y // 400 - 32045
+
+# Function to convert Julian Day Numbers back to (year, month, day) with astronomical years, vectorized
+def jdn_to_calendar(jdn, calendar="gregorian"):
+    jdn = np.asarray(jdn)
+    if calendar == "julian":
+        b = 0
+        c = jdn + 32082
+    else:
+        a = jdn + 32044
+        b = (4 * a + 3) // 146097
+        c = a - 146097 * b // 4
+    d = (4 * c + 3) // 1461
+    e = c - 1461 * d // 4
+    m = (5 * e + 2) // 153
+    day = e - (153 * m + 2) // 5 + 1
+    month = m + 3 - 12 * (m // 10)
+    year = 100 * b + d - 4800 + m // 10
+    return year, month, day
+
+# Function to count the grid points from January 1 of start_year to December 31 of end_year (historical years)
+def grid_size(start_year, end_year, interval, calendar="gregorian"):
+    first, last = astronomical_year(start_year), astronomical_year(end_year) + 1
+    if interval in INTERVAL_MINUTES:
+        days = calendar_to_jdn(last, 1, 1, calendar) - calendar_to_jdn(first, 1, 1, calendar)
+        return int(days * 1440 // INTERVAL_MINUTES[interval])
+    return int((last - first) * 12 // INTERVAL_MONTHS[interval])
+
+# Function to build grid points first..last-1 as a dict of 'jdn' and 'minute' (minute of the day) arrays
+def build_grid(start_year, interval, first, last, calendar="gregorian"):
+    return grid_points(start_year, interval, np.arange(first, last, dtype=np.int64), calendar)
+
+# Function to build the grid points with the given step indices (any order), like build_grid
+def grid_points(start_year, interval, steps, calendar="gregorian"):
+    steps = np.asarray(steps, dtype=np.int64)
+    start = astronomical_year(start_year)
+    if interval in INTERVAL_MINUTES:
+        minutes = steps * INTERVAL_MINUTES[interval]
+        return {'jdn': calendar_to_jdn(start, 1, 1, calendar) + minutes // 1440, 'minute': minutes % 1440}
+
+    months = steps * INTERVAL_MONTHS[interval]
+    jdn = calendar_to_jdn(start + months // 12, months % 12 + 1, 1, calendar)
+    return {'jdn': jdn, 'minute': np.zeros_like(jdn)}
+
+# Function to yield the grid in chunks of at most chunk_size points, so memory stays bounded
+def iter_time_grid(start_year, end_year, interval, chunk_size, calendar="gregorian"):
+    if calendar not in CALENDARS:
+        raise ValueError(f"Unknown calendar {calendar}; choose one of {CALENDARS}")
+    total = grid_size(start_year, end_year, interval, calendar)
+    for first in range(0, total, chunk_size):
+        yield build_grid(start_year, interval, first, min(first + chunk_size, total), calendar)
+
+# Function to turn a grid of local instants into one Skyfield Time in UTC, with no string round-trips.
+# JDN 0 is -4713-11-24 in Skyfield's proleptic Gregorian calendar, so the day count can be passed as is.
+def grid_to_time(ts, grid, zone):
+    return ts.utc(-4713, 11, 24 + grid['jdn'], 0, grid['minute'] - round(zone * 60))
+
+# Function to label grid points with the Date ("YYYY-MM-DD", "YYYY-MM-DD BCE") and Time ("HH:MM") strings of the CSV
+def grid_labels(grid, calendar="gregorian"):
+    year, month, day = jdn_to_calendar(grid['jdn'], calendar)
+    year = historical_year(year)
+    dates = [format_date(y, m, d) for y, m, d in zip(year.tolist(), month.tolist(), day.tolist())]
+    times = [f"{minute // 60:02d}:{minute % 60:02d}" for minute in grid['minute'].tolist()]
+    return dates, times
@@ -16,64 +16,162 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 '''
 # visualization.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
 import numpy as np
-
-def plot_planet_positions_polar(planet_positions, score, probability, ra_dec_info, date, time):
-    # Set up a polar plot
-    fig = plt.figure(figsize=(10, 8))
+from matplotlib.figure import Figure
+
+# Define the alchemical colors and symbols
+ALCHEMICAL_COLORS = {
+    'sun': 'gold',
+    'mercury': 'gray',
+    'venus': 'green',
+    'earth': 'blue',
+    'mars': 'red',
+    'jupiter': 'orange',
+    'saturn': 'black'
+}
+
+ALCHEMICAL_SYMBOLS = {
+    'sun': '☉',
+    'mercury': '☿',
+    'venus': '♀',
+    'earth': '♁',
+    'mars': '♂',
+    'jupiter': '♃',
+    'saturn': '♄'
+}
+
+# Function to build the polar axes, one artist per planet, legend and info box on a figure.
+# Returns a dict of the artists so update_polar_axes can change their data in place.
+def build_polar_axes(fig, planets):
     ax = fig.add_subplot(111, polar=True)
+    state = {'fig': fig, 'ax': ax, 'planets': list(planets), 'points': {}, 'labels': {}}
 
-    # Define the alchemical colors and symbols
-    alchemical_colors = {
-        'sun': 'gold',
-        'mercury': 'gray',
-        'venus': 'green',
-        'earth': 'blue',
-        'mars': 'red',
-        'jupiter': 'orange',
-        'saturn': 'black'
-    }
-
-    alchemical_symbols = {
-        'sun': '☉',
-        'mercury': '☿',
-        'venus': '♀',
-        'earth': '♁',
-        'mars': '♂',
-        'jupiter': '♃',
-        'saturn': '♄'
-    }
-
-    for planet, (ra, dec, distance) in planet_positions.items():
+    for planet in state['planets']:
         if planet == 'sun':  # Sun is at the center
-            ax.scatter(0, 0, label=f"{alchemical_symbols[planet]} Sun (0 AU)", color=alchemical_colors[planet], s=200, edgecolor='black')
+            state['points'][planet] = ax.scatter([0], [0], label=f"{ALCHEMICAL_SYMBOLS[planet]} Sun (0 AU)", color=ALCHEMICAL_COLORS[planet], s=200, edgecolor='black')
             continue
 
-        # Convert RA (Right Ascension) to radians for the polar plot
-        ra_radians = np.radians(ra)
-
-        # Plot each planet with RA as angle (theta) and distance as radius (r)
-        ax.scatter(ra_radians, distance, label=f"{alchemical_symbols[planet]} {planet.capitalize()} ({distance:.2f} AU)", color=alchemical_colors[planet], s=100)
+        # Plot each planet with RA as angle (theta) and distance as radius (r); positions are set by update_polar_axes
+        state['points'][planet] = ax.scatter([0], [0], label=planet, color=ALCHEMICAL_COLORS[planet], s=100)
 
         # Adjust the horizontal alignment and position of the labels
-        ax.text(ra_radians, distance, planet, fontsize=9, ha='left', color=alchemical_colors[planet], va='bottom')
+        state['labels'][planet] = ax.text(0, 0, planet, fontsize=9, ha='left', color=ALCHEMICAL_COLORS[planet], va='bottom')
 
     # Labels and grid settings for the polar plot
-    ax.set_title(f"Planetary Positions Relative to the Sun\nDate: {date}, Time: {time}")
     ax.set_theta_direction(-1)  # Set direction of theta (clockwise)
     ax.set_theta_offset(np.pi / 2.0)  # Set the zero-point to the top (as in celestial maps)
 
     # Move the legend outside the plot
-    legend1 = ax.legend(loc='upper left', bbox_to_anchor=(1.05, 1), borderaxespad=0.)
+    state['legend'] = ax.legend(loc='upper left', bbox_to_anchor=(1.05, 1), borderaxespad=0.)
 
     # Add another text box for additional information
+    state['info'] = fig.text(0.78, 0.5, '', fontsize=10, bbox=dict(facecolor='white', alpha=0.5))
+    return state
+
+# Function to move the artists of build_polar_axes to a new set of positions without rebuilding anything.
+# r_max fixes the radial scale (e.g. across animation frames); by default it follows the outermost planet.
+def update_polar_axes(state, planet_positions, score, probability, ra_dec_info, date, time, r_max=None):
+    ax = state['ax']
+    legend_texts = dict(zip(state['planets'], state['legend'].get_texts()))
+    for planet, (ra, dec, distance) in planet_positions.items():
+        if planet == 'sun':
+            continue
+
+        # Convert RA (Right Ascension) to radians for the polar plot
+        ra_radians = np.radians(ra)
+        state['points'][planet].set_offsets([[ra_radians, distance]])
+        state['labels'][planet].set_position((ra_radians, distance))
+        legend_texts[planet].set_text(f"{ALCHEMICAL_SYMBOLS[planet]} {planet.capitalize()} ({distance:.2f} AU)")
+
+    ax.set_ylim(0, r_max or 1.1 * max(distance for _, _, distance in planet_positions.values()))
+    ax.set_title(f"Planetary Positions Relative to the Sun\nDate: {date}, Time: {time}")
+
     info_text = f"Score: {score}\nProbability of Magnetic Interference: {probability}%\n\nRA & Dec:\n"
     for planet, (ra, dec) in ra_dec_info.items():
-        info_text += f"{alchemical_symbols[planet]} {planet.capitalize()}: RA = {ra:.2f}°, Dec = {dec:.2f}°\n"
+        info_text += f"{ALCHEMICAL_SYMBOLS[planet]} {planet.capitalize()}: RA = {ra:.2f}°, Dec = {dec:.2f}°\n"
+    state['info'].set_text(info_text)
 
-    plt.gcf().text(0.78, 0.5, info_text, fontsize=10, bbox=dict(facecolor='white', alpha=0.5))
+def plot_planet_positions_polar(planet_positions, score, probability, ra_dec_info, date, time):
+    # Set up a polar plot
+    fig = plt.figure(figsize=(10, 8))
+    state = build_polar_axes(fig, planet_positions)
+    update_polar_axes(state, planet_positions, score, probability, ra_dec_info, date, time)
 
     # Show the plot
     plt.show()
 
+# Function to turn row i of batch arrays (see astro_utils.get_planet_positions_batch) into plot arguments
+def frame_arguments(frames, i):
+    planet_positions = {planet: (frames['ra'][i, column], frames['dec'][i, column], frames['distance'][i, column])
+                        for column, planet in enumerate(frames['planets'])}
+    ra_dec_info = {planet: (ra, dec) for planet, (ra, dec, _) in planet_positions.items()}
+    return planet_positions, frames['score'][i], frames['probability'][i], ra_dec_info, frames['date'][i], frames['time'][i]
+
+# Function to render a slice of frames to PNG files on one reused off-screen (Agg) figure.
+# offset is the global index of the slice's first frame, used in the file names.
+def render_frame_range(frames, offset, output_dir, r_max, dpi):
+    state = build_polar_axes(Figure(figsize=(10, 8)), frames['planets'])
+    for i in range(len(frames['score'])):
+        update_polar_axes(state, *frame_arguments(frames, i), r_max=r_max)
+        state['fig'].savefig(os.path.join(output_dir, f"frame-{offset + i:06d}.png"), dpi=dpi)
+    return len(frames['score'])
+
+# Function to render every frame to output_dir/frame-NNNNNN.png across a process pool; returns the frame count.
+# frames is a dict of batch arrays: 'planets', 'ra', 'dec', 'distance', 'score', 'probability', 'date', 'time'.
+def render_frames(frames, output_dir, workers=None, dpi=100):
+    os.makedirs(output_dir, exist_ok=True)
+    n_frames = len(frames['score'])
+    r_max = 1.1 * float(np.max(frames['distance']))
+    workers = workers or os.cpu_count()
+    bounds = np.linspace(0, n_frames, min(workers, n_frames) + 1).astype(int)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_frame_range, slice_frames(frames, first, last), first, output_dir, r_max, dpi)
+                   for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+        return sum(future.result() for future in futures)
+
+# Function to cut the batch arrays of frames down to rows first:last
+def slice_frames(frames, first, last):
+    sliced = {name: values[first:last] for name, values in frames.items() if name != 'planets'}
+    sliced['planets'] = frames['planets']
+    return sliced
+
+# Function to render all frames into one MP4 (ffmpeg) or GIF (Pillow) animation, reusing one figure.
+# MP4 frames stream to ffmpeg, so memory stays flat; GIF frames are held by Pillow until the file is written.
+def render_animation(frames, output_path, fps=10, dpi=100):
+    from matplotlib.animation import FuncAnimation
+
+    state = build_polar_axes(Figure(figsize=(10, 8)), frames['planets'])
+    r_max = 1.1 * float(np.max(frames['distance']))
+    animation = FuncAnimation(state['fig'], lambda i: update_polar_axes(state, *frame_arguments(frames, i), r_max=r_max),
+                              frames=len(frames['score']), blit=False)
+    writer = 'pillow' if output_path.lower().endswith('.gif') else 'ffmpeg'
+    animation.save(output_path, writer=writer, fps=fps, dpi=dpi)
+
+# Function to plot score and probability time series straight from batch arrays
+def plot_score_strip(x, scores, probabilities, output_path, xlabel='Time'):
+    fig = Figure(figsize=(14, 5))
+    score_ax, probability_ax = fig.subplots(2, 1, sharex=True)
+    score_ax.plot(x, scores, color='tab:blue', linewidth=0.8)
+    score_ax.set_ylabel('Score')
+    probability_ax.fill_between(x, probabilities, color='tab:red', alpha=0.6, linewidth=0)
+    probability_ax.set_ylabel('Probability (%)')
+    probability_ax.set_ylim(0, 100)
+    probability_ax.set_xlabel(xlabel)
+    fig.tight_layout()
+    fig.savefig(output_path)
+
+# Function to plot probabilities as a heatmap with row_length samples per row (e.g. 24 hourly samples per day)
+def plot_probability_heatmap(probabilities, row_length, output_path, row_label='Row', column_label='Sample'):
+    n_rows = len(probabilities) // row_length
+    grid = np.asarray(probabilities[:n_rows * row_length], dtype=float).reshape(n_rows, row_length)
+    fig = Figure(figsize=(10, 8))
+    ax = fig.add_subplot(111)
+    image = ax.imshow(grid, aspect='auto', cmap='inferno', vmin=0, vmax=100, interpolation='nearest')
+    fig.colorbar(image, ax=ax, label='Probability (%)')
+    ax.set_xlabel(column_label)
+    ax.set_ylabel(row_label)
+    fig.savefig(output_path)